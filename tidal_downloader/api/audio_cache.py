@@ -0,0 +1,275 @@
+import asyncio
+import json
+import os
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Optional, Set
+
+import aiofiles
+
+from .http_client import get_http_client
+from .log import get_logger
+from .metrics import cdn_bytes
+
+# Caché en disco del audio servido por /tidal/stream
+AUDIO_CACHE_DIR = os.getenv("AUDIO_CACHE_DIR", "data/audio_cache")
+AUDIO_CACHE_MAX_BYTES = int(os.getenv("AUDIO_CACHE_MAX_BYTES", 2 * 1024 * 1024 * 1024))
+# Descargas en segundo plano para completar pistas que el cliente dejó a medias
+AUDIO_CACHE_FILL_CONCURRENCY = int(os.getenv("AUDIO_CACHE_FILL_CONCURRENCY", 2))
+AUDIO_CACHE_CHUNK_SIZE = 64 * 1024
+
+log = get_logger("audio_cache")
+
+_UNSAFE_KEY_CHARS = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+def audio_cache_key(track_id: str, quality: Any) -> str:
+    """Clave de caché estable para una pista y calidad (la URL firmada cambia en cada manifiesto)"""
+    return _UNSAFE_KEY_CHARS.sub("_", f"{track_id}-{getattr(quality, 'value', quality)}")
+
+
+@dataclass
+class AudioEntry:
+    """Pista en disco: los primeros `size` bytes de un archivo de `total_size` bytes"""
+    key: str
+    total_size: int
+    content_type: str
+    size: int = 0
+
+    @property
+    def complete(self) -> bool:
+        return self.size >= self.total_size
+
+
+class AudioCacheWriter:
+    """Añade bytes al final del prefijo en disco de una entrada.
+
+    Solo hay un escritor por entrada a la vez; los errores de disco
+    desactivan la escritura sin afectar al stream que se está sirviendo.
+    """
+
+    def __init__(self, cache: "AudioCache", entry: AudioEntry, file):
+        self.cache = cache
+        self.entry = entry
+        self._file = file
+        self.closed = False
+
+    async def write(self, data: bytes):
+        if self.closed:
+            return
+        try:
+            await self._file.write(data)
+            # Los lectores confían en entry.size: los bytes tienen que estar ya en el archivo
+            await self._file.flush()
+        except OSError as e:
+            log.warning("Error al escribir en la caché de audio", key=self.entry.key, error=str(e))
+            await self.close()
+            return
+        self.entry.size += len(data)
+        self.cache.bytes_written += len(data)
+        self.cache.total_bytes += len(data)
+        self.cache.evict()
+
+    async def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            await self._file.close()
+        finally:
+            self.cache.writers.discard(self.entry.key)
+
+
+class AudioCache:
+    """Caché LRU en disco, acotada por bytes, del audio que se sirve por streaming.
+
+    Cada pista se guarda como un prefijo contiguo que se va completando
+    mientras se sirve; las peticiones posteriores (incluidas las de un rango)
+    se leen de disco siempre que los bytes pedidos ya estén guardados.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, fill_concurrency: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.fill_concurrency = fill_concurrency
+        self._entries: "OrderedDict[str, AudioEntry]" = OrderedDict()
+        self._fill_slots: Optional[asyncio.Semaphore] = None
+        self._fill_tasks: Set[asyncio.Task] = set()
+        # Claves con un escritor activo (no se desalojan ni admiten otro escritor)
+        self.writers: Set[str] = set()
+        self.total_bytes = 0
+
+        # Métricas
+        self.hits = 0
+        self.partial_hits = 0
+        self.misses = 0
+        self.bytes_from_disk = 0
+        self.bytes_from_cdn = 0
+        self.bytes_written = 0
+        self.evictions = 0
+        self.background_fills = 0
+
+        if self.enabled:
+            self._load()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _load(self):
+        """Reconstruir el índice a partir de los archivos de un arranque anterior"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        found = []
+        for meta_path in self.directory.glob("*.json"):
+            data_path = meta_path.with_suffix(".audio")
+            try:
+                meta = json.loads(meta_path.read_text())
+                stat = data_path.stat()
+            except (OSError, ValueError):
+                meta_path.unlink(missing_ok=True)
+                data_path.unlink(missing_ok=True)
+                continue
+            entry = AudioEntry(meta_path.stem, meta["total_size"], meta["content_type"], min(stat.st_size, meta["total_size"]))
+            found.append((stat.st_mtime, entry))
+        # Orden LRU aproximado por fecha de modificación
+        for _, entry in sorted(found, key=lambda item: item[0]):
+            self._entries[entry.key] = entry
+            self.total_bytes += entry.size
+        for data_path in self.directory.glob("*.audio"):
+            if data_path.stem not in self._entries:
+                data_path.unlink(missing_ok=True)
+        self.evict()
+
+    def path(self, key: str) -> Path:
+        return self.directory / f"{key}.audio"
+
+    def lookup(self, key: str) -> Optional[AudioEntry]:
+        if not self.enabled:
+            return None
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    async def open_writer(self, key: str, start: int, total_size: Optional[int], content_type: Optional[str]) -> Optional[AudioCacheWriter]:
+        """Escritor para guardar los bytes desde `start`, si continúan el prefijo en disco.
+
+        Devuelve None si la caché está desactivada, la pista no cabe, ya hay
+        otro escritor o `start` no coincide con el final del prefijo guardado.
+        """
+        if not self.enabled or key in self.writers:
+            return None
+        entry = self._entries.get(key)
+        if entry is None:
+            if start != 0 or not total_size or total_size > self.max_bytes:
+                return None
+            entry = AudioEntry(key, total_size, content_type or "application/octet-stream")
+            meta = json.dumps({"total_size": entry.total_size, "content_type": entry.content_type})
+            try:
+                async with aiofiles.open(self.directory / f"{key}.json", "w") as f:
+                    await f.write(meta)
+            except OSError as e:
+                log.warning("Error al crear la entrada de la caché de audio", key=key, error=str(e))
+                return None
+            self._entries[key] = entry
+        if entry.complete or start != entry.size:
+            return None
+        try:
+            file = await aiofiles.open(self.path(key), "ab")
+        except OSError as e:
+            log.warning("Error al abrir la entrada de la caché de audio", key=key, error=str(e))
+            return None
+        self.writers.add(key)
+        return AudioCacheWriter(self, entry, file)
+
+    async def read(self, key: str, start: int, end: int, chunk_size: int = AUDIO_CACHE_CHUNK_SIZE) -> AsyncIterator[bytes]:
+        """Leer de disco los bytes [start, end] (ambos incluidos) por bloques"""
+        # Si la entrada se desaloja mientras tanto, el archivo abierto sigue siendo legible
+        async with aiofiles.open(self.path(key), "rb") as f:
+            await f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = await f.read(min(chunk_size, remaining))
+                if not chunk:
+                    # Se anunció un Content-Length que ya no se puede cumplir: cortar el stream
+                    raise OSError(f"Caché de audio truncada: faltan {remaining} bytes de {key}")
+                remaining -= len(chunk)
+                self.bytes_from_disk += len(chunk)
+                yield chunk
+
+    def evict(self):
+        """Eliminar las entradas menos usadas hasta volver al presupuesto de bytes"""
+        # Se llama tras cada bloque escrito: no copiar las claves si no hace falta
+        if self.total_bytes <= self.max_bytes:
+            return
+        for key in list(self._entries):
+            if self.total_bytes <= self.max_bytes:
+                break
+            if key in self.writers:
+                continue
+            entry = self._entries.pop(key)
+            self.total_bytes -= entry.size
+            self.evictions += 1
+            self.path(key).unlink(missing_ok=True)
+            (self.directory / f"{key}.json").unlink(missing_ok=True)
+
+    def fill_in_background(self, key: str, url: str):
+        """Completar en segundo plano una entrada a medias desde la URL del CDN"""
+        entry = self._entries.get(key)
+        if entry is None or entry.complete or key in self.writers:
+            return
+        task = asyncio.create_task(self._fill(key, url))
+        self._fill_tasks.add(task)
+        task.add_done_callback(self._fill_tasks.discard)
+
+    async def _fill(self, key: str, url: str):
+        if self._fill_slots is None:
+            self._fill_slots = asyncio.Semaphore(self.fill_concurrency)
+        async with self._fill_slots:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            writer = await self.open_writer(key, entry.size, entry.total_size, entry.content_type)
+            if writer is None:
+                return
+            self.background_fills += 1
+            try:
+                headers = {"Accept-Encoding": "identity", "Range": f"bytes={entry.size}-"}
+                async with get_http_client().get(url, headers=headers) as response:
+                    if response.status != 206:
+                        return
+                    async for chunk in response.content.iter_chunked(AUDIO_CACHE_CHUNK_SIZE):
+                        self.bytes_from_cdn += len(chunk)
+                        cdn_bytes.inc("fill", amount=len(chunk))
+                        await writer.write(chunk)
+                        if writer.closed:
+                            return
+            except Exception as e:
+                log.warning("Error al completar la entrada de la caché de audio", key=key, error=str(e))
+            finally:
+                await writer.close()
+
+    def stats(self) -> Dict[str, Any]:
+        requests = self.hits + self.partial_hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "complete_entries": sum(1 for entry in self._entries.values() if entry.complete),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "partial_hits": self.partial_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.partial_hits) / requests, 4) if requests else 0.0,
+            "bytes_saved": self.bytes_from_disk,
+            "bytes_from_cdn": self.bytes_from_cdn,
+            "bytes_written": self.bytes_written,
+            "evictions": self.evictions,
+            "background_fills": self.background_fills,
+            "active_writers": len(self.writers),
+        }
+
+
+audio_cache = AudioCache(AUDIO_CACHE_DIR, AUDIO_CACHE_MAX_BYTES, AUDIO_CACHE_FILL_CONCURRENCY)
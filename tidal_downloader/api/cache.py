@@ -0,0 +1,550 @@
+import asyncio
+import heapq
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from .log import get_logger
+
+log = get_logger("cache")
+
+
+class TTLCache:
+    """Caché en memoria acotada por número de entradas, con LRU y TTL por entrada."""
+
+    def __init__(self, max_entries: int, default_ttl: float):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+        # Métricas
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        expires_at, value = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and time.monotonic() < entry[0]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        ttl = self.default_ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+@dataclass
+class CacheEntry:
+    """Respuesta comprimida guardada en la caché"""
+    endpoint: str
+    data: bytes
+    expires_at: float
+    # Fin del periodo fresco; entre fresh_until y expires_at la entrada es obsoleta
+    fresh_until: Optional[float] = None
+    # ETag fuerte del JSON sin comprimir
+    etag: Optional[str] = None
+
+    @property
+    def size(self) -> int:
+        return len(self.data)
+
+    def is_fresh(self, now: Optional[float] = None) -> bool:
+        now = time.time() if now is None else now
+        return now < (self.expires_at if self.fresh_until is None else self.fresh_until)
+
+
+class ResponseCache:
+    """Caché LRU de respuestas comprimidas, acotada por bytes totales.
+
+    Las expiraciones se guardan en un min-heap para encontrar las entradas
+    caducadas en O(log n) sin recorrer toda la caché.
+    """
+
+    def __init__(self, max_bytes: int, max_entries: int):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.total_bytes = 0
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._expiry_heap: List[Tuple[float, str]] = []
+        # Aviso cuando una entrada nueva caduca antes que todas las demás
+        self.on_earlier_expiry: Optional[Callable[[float], None]] = None
+
+        # Métricas globales y por endpoint
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.coalesced = 0
+        self.stale_hits = 0
+        self.revalidations = 0
+        self._endpoint_stats: Dict[str, Dict[str, int]] = {}
+
+    def _endpoint(self, endpoint: str) -> Dict[str, int]:
+        stats = self._endpoint_stats.get(endpoint)
+        if stats is None:
+            stats = {
+                "entries": 0, "bytes": 0, "hits": 0, "misses": 0,
+                "evictions": 0, "expirations": 0, "coalesced": 0,
+                "stale_hits": 0, "revalidations": 0,
+            }
+            self._endpoint_stats[endpoint] = stats
+        return stats
+
+    def get(self, key: str, endpoint: str) -> Optional[CacheEntry]:
+        entry = self._entries.get(key)
+        if entry is not None and time.time() >= entry.expires_at:
+            self._remove(key)
+            self.expirations += 1
+            self._endpoint(endpoint)["expirations"] += 1
+            entry = None
+        if entry is None:
+            self.misses += 1
+            self._endpoint(endpoint)["misses"] += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        self._endpoint(endpoint)["hits"] += 1
+        if not entry.is_fresh():
+            self.stale_hits += 1
+            self._endpoint(endpoint)["stale_hits"] += 1
+        return entry
+
+    def set(self, key: str, entry: CacheEntry):
+        if entry.size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = entry
+        self.total_bytes += entry.size
+        stats = self._endpoint(entry.endpoint)
+        stats["entries"] += 1
+        stats["bytes"] += entry.size
+        earliest = self.next_expiry()
+        heapq.heappush(self._expiry_heap, (entry.expires_at, key))
+        if self.on_earlier_expiry is not None and (earliest is None or entry.expires_at < earliest):
+            self.on_earlier_expiry(entry.expires_at)
+
+        # Desalojar las menos usadas hasta volver al presupuesto
+        while self.total_bytes > self.max_bytes or len(self._entries) > self.max_entries:
+            oldest_key, oldest = next(iter(self._entries.items()))
+            self._remove(oldest_key)
+            self.evictions += 1
+            self._endpoint(oldest.endpoint)["evictions"] += 1
+
+        # Las entradas reemplazadas dejan restos en el heap; compactarlo si crece demasiado
+        if len(self._expiry_heap) > 2 * len(self._entries) + 64:
+            self._expiry_heap = [(e.expires_at, k) for k, e in self._entries.items()]
+            heapq.heapify(self._expiry_heap)
+
+    def delete(self, key: str):
+        if key in self._entries:
+            self._remove(key)
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self.total_bytes -= entry.size
+        stats = self._endpoint(entry.endpoint)
+        stats["entries"] -= 1
+        stats["bytes"] -= entry.size
+
+    def record_revalidation(self, endpoint: str):
+        """Contar un refresco en segundo plano de una entrada obsoleta"""
+        self.revalidations += 1
+        self._endpoint(endpoint)["revalidations"] += 1
+
+    def record_coalesced(self, endpoint: str):
+        """Contar una petición que esperó a un cálculo ya en curso en lugar de repetirlo"""
+        self.coalesced += 1
+        self._endpoint(endpoint)["coalesced"] += 1
+
+    def purge_expired(self, now: Optional[float] = None) -> int:
+        """Eliminar las entradas caducadas; O(log n) por entrada eliminada"""
+        now = time.time() if now is None else now
+        removed = 0
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            expires_at, key = heapq.heappop(self._expiry_heap)
+            entry = self._entries.get(key)
+            # Ignorar restos de entradas ya reemplazadas o desalojadas
+            if entry is None or entry.expires_at != expires_at:
+                continue
+            self._remove(key)
+            self.expirations += 1
+            self._endpoint(entry.endpoint)["expirations"] += 1
+            removed += 1
+        return removed
+
+    def next_expiry(self) -> Optional[float]:
+        return self._expiry_heap[0][0] if self._expiry_heap else None
+
+    def clear(self):
+        self._entries.clear()
+        self._expiry_heap.clear()
+        self.total_bytes = 0
+        for stats in self._endpoint_stats.values():
+            stats["entries"] = 0
+            stats["bytes"] = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "coalesced": self.coalesced,
+            "stale_hits": self.stale_hits,
+            "revalidations": self.revalidations,
+            "endpoints": {name: dict(stats) for name, stats in self._endpoint_stats.items()},
+        }
+
+
+class ExpiryScheduler:
+    """Tarea que elimina las entradas de una ResponseCache cuando caducan.
+
+    Duerme hasta la próxima caducidad del heap (con una resolución mínima
+    para agrupar las que caducan casi a la vez) y se despierta antes si se
+    inserta una entrada que caduca primero. Opcionalmente purga también un
+    backend persistente cada `backend_interval` segundos.
+    """
+
+    def __init__(
+        self,
+        cache: ResponseCache,
+        resolution: float = 1.0,
+        backend_purge: Optional[Callable[[], Awaitable[Any]]] = None,
+        backend_interval: float = 300.0,
+    ):
+        self.cache = cache
+        self.resolution = resolution
+        self.backend_purge = backend_purge
+        self.backend_interval = backend_interval
+        self._task: Optional["asyncio.Task[None]"] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._deadline: Optional[float] = None
+
+        # Métricas
+        self.runs = 0
+        self.purged = 0
+        self.backend_runs = 0
+
+    def start(self):
+        if self._task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self.cache.on_earlier_expiry = self._reschedule
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self.cache.on_earlier_expiry = None
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def _reschedule(self, expires_at: float):
+        if self._wakeup is not None and (self._deadline is None or expires_at < self._deadline):
+            self._wakeup.set()
+
+    async def _run(self):
+        next_backend_purge = time.time() + self.backend_interval
+        while True:
+            # Limpiar el aviso antes de purgar: uno que llegue durante la purga no se pierde
+            self._wakeup.clear()
+            now = time.time()
+            self.purged += self.cache.purge_expired(now)
+            self.runs += 1
+
+            if self.backend_purge is not None and now >= next_backend_purge:
+                next_backend_purge = now + self.backend_interval
+                try:
+                    await self.backend_purge()
+                    self.backend_runs += 1
+                except Exception as e:
+                    log.warning("Error al limpiar la caché persistente", error=str(e))
+
+            deadline = self.cache.next_expiry()
+            if self.backend_purge is not None:
+                deadline = next_backend_purge if deadline is None else min(deadline, next_backend_purge)
+            self._deadline = deadline
+            timeout = None if deadline is None else max(deadline - time.time(), self.resolution)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "next_expiry_in": round(self._deadline - time.time(), 3) if self._deadline is not None else None,
+            "runs": self.runs,
+            "purged": self.purged,
+            "backend_runs": self.backend_runs,
+        }
+
+
+class SingleFlight:
+    """Agrupa las llamadas concurrentes con la misma clave en una sola ejecución.
+
+    Todas las llamadas esperan la misma tarea y reciben su resultado o su
+    excepción. La tarea no se cancela si se desconecta quien la inició.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, "asyncio.Future[Any]"] = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._inflight
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            self.executions += 1
+            task.add_done_callback(lambda done, key=key: self._finish(key, done))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: "asyncio.Future[Any]"):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Marcar la excepción como recuperada aunque nadie siga esperando
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._inflight),
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+        }
+
+
+class CacheBackend(ABC):
+    """Almacenamiento persistente detrás de ResponseCache.
+
+    Los métodos son síncronos y bloqueantes: se llaman desde el pool "cache".
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[CacheEntry]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, entry: CacheEntry):
+        ...
+
+    @abstractmethod
+    def delete(self, key: str):
+        ...
+
+    @abstractmethod
+    def purge_expired(self, now: Optional[float] = None) -> int:
+        ...
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+    def close(self):
+        pass
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """Caché de respuestas en SQLite que sobrevive a reinicios.
+
+    Guarda los payloads ya comprimidos. Usa modo WAL para que varios workers
+    del mismo host puedan leer y escribir el mismo archivo a la vez.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: List[sqlite3.Connection] = []
+        self._writes_since_trim = 0
+
+        # Métricas
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS response_cache ("
+            " key TEXT PRIMARY KEY,"
+            " endpoint TEXT NOT NULL,"
+            " data BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " fresh_until REAL,"
+            " etag TEXT)"
+        )
+        # Añadir columnas nuevas a archivos creados por versiones anteriores
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(response_cache)")}
+        for column, column_type in (("fresh_until", "REAL"), ("etag", "TEXT")):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE response_cache ADD COLUMN {column} {column_type}")
+        conn.execute("CREATE INDEX IF NOT EXISTS response_cache_expires_at ON response_cache (expires_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        # Una conexión por hilo del pool
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        row = self._connection().execute(
+            "SELECT endpoint, data, expires_at, fresh_until, etag FROM response_cache WHERE key = ? AND expires_at > ?",
+            (key, time.time()),
+        ).fetchone()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return CacheEntry(endpoint=row[0], data=row[1], expires_at=row[2], fresh_until=row[3], etag=row[4])
+
+    def set(self, key: str, entry: CacheEntry):
+        if entry.size > self.max_bytes:
+            return
+        self._connection().execute(
+            "INSERT OR REPLACE INTO response_cache (key, endpoint, data, size, expires_at, fresh_until, etag)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, entry.endpoint, entry.data, entry.size, entry.expires_at, entry.fresh_until, entry.etag),
+        )
+        with self._lock:
+            self.writes += 1
+            self._writes_since_trim += 1
+            trim = self._writes_since_trim >= 100
+            if trim:
+                self._writes_since_trim = 0
+        if trim:
+            self._trim()
+
+    def _trim(self):
+        """Mantener el archivo dentro del presupuesto descartando lo que caduca antes"""
+        conn = self._connection()
+        self.purge_expired()
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM response_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        freed = 0
+        keys = []
+        for key, size in conn.execute("SELECT key, size FROM response_cache ORDER BY expires_at"):
+            keys.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        conn.executemany("DELETE FROM response_cache WHERE key = ?", keys)
+        with self._lock:
+            self.evictions += len(keys)
+
+    def delete(self, key: str):
+        self._connection().execute("DELETE FROM response_cache WHERE key = ?", (key,))
+
+    def purge_expired(self, now: Optional[float] = None) -> int:
+        now = time.time() if now is None else now
+        cursor = self._connection().execute("DELETE FROM response_cache WHERE expires_at <= ?", (now,))
+        return cursor.rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "type": "sqlite",
+            "path": self.path,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "evictions": self.evictions,
+        }
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+
+def create_cache_backend(kind: str, path: str, max_bytes: int) -> Optional[CacheBackend]:
+    """Crear el backend persistente configurado ("memory" desactiva la persistencia)"""
+    if kind == "sqlite":
+        return SQLiteCacheBackend(path, max_bytes)
+    if kind in ("", "memory", "none"):
+        return None
+    raise ValueError(f"Backend de caché desconocido: {kind}")
@@ -1,6 +1,6 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .middleware import SessionVerificationMiddleware
+from .middleware import SessionVerificationMiddleware, MetricsMiddleware
 
 def configure_app(app: FastAPI) -> None:
     """Configura la aplicación FastAPI con middleware y configuraciones necesarias."""
@@ -15,4 +15,7 @@ def configure_app(app: FastAPI) -> None:
     )
 
     # Añadir middleware de verificación de sesión
-    app.add_middleware(SessionVerificationMiddleware) 
\ No newline at end of file
+    app.add_middleware(SessionVerificationMiddleware)
+
+    # Métricas por ruta (el último añadido es el más externo: mide toda la petición)
+    app.add_middleware(MetricsMiddleware) 
\ No newline at end of file
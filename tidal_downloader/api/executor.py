@@ -0,0 +1,181 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+
+class ExecutorBusyError(RuntimeError):
+    """Se lanza cuando la cola de un pool está llena y no se liberó espacio a tiempo."""
+
+
+class BlockingExecutor:
+    """Pool de hilos acotado para llamadas bloqueantes (tidalapi, disco).
+
+    Limita el número de tareas en vuelo a `max_workers + max_queue`; las
+    peticiones que superan ese límite esperan en el event loop hasta
+    `queue_timeout` segundos y después fallan con ExecutorBusyError.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        # Protege los contadores que se modifican desde los hilos del pool
+        self._lock = threading.Lock()
+
+        # Métricas
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.waiting = 0
+        self.queued = 0
+        self.running = 0
+        self.max_queue_depth = 0
+        self.total_wait_time = 0.0
+        self.max_wait_time = 0.0
+        self.total_run_time = 0.0
+        self.max_run_time = 0.0
+
+    def _ensure_started(self):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f"{self.name}-worker")
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers + self.max_queue)
+
+    @property
+    def queue_depth(self) -> int:
+        """Tareas que esperan hilo libre o espacio en la cola"""
+        return self.waiting + self.queued
+
+    def _release_slot(self, loop: asyncio.AbstractEventLoop):
+        # Se llama desde el hilo del pool (o al cancelar, desde el event loop)
+        try:
+            loop.call_soon_threadsafe(self._slots.release)
+        except RuntimeError:
+            # El event loop ya se cerró durante el apagado
+            pass
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Ejecutar `func` en el pool sin bloquear el event loop"""
+        self._ensure_started()
+        loop = asyncio.get_running_loop()
+        enqueued_at = time.perf_counter()
+
+        self.waiting += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise ExecutorBusyError(f"Pool '{self.name}' saturado ({self.queue_depth} tareas en cola)")
+        finally:
+            self.waiting -= 1
+
+        self.submitted += 1
+        with self._lock:
+            self.queued += 1
+        state: Dict[str, Any] = {}
+
+        def call():
+            # Se ejecuta en el hilo del pool
+            with self._lock:
+                if state.get("abandoned"):
+                    return None
+                state["started_at"] = time.perf_counter()
+                self.queued -= 1
+                self.running += 1
+            try:
+                return func(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.running -= 1
+
+        future = self._pool.submit(call)
+        # El hueco se libera cuando termina el hilo, no cuando deja de esperarlo
+        # quien lo pidió: una petición cancelada no puede desbordar el límite del pool
+        future.add_done_callback(lambda _: self._release_slot(loop))
+        try:
+            result = await asyncio.wrap_future(future, loop=loop)
+            self.completed += 1
+            return result
+        except BaseException:
+            self.failed += 1
+            raise
+        finally:
+            finished = time.perf_counter()
+            with self._lock:
+                started_at = state.get("started_at")
+                if started_at is None:
+                    # Cancelada antes de llegar a un hilo: no se ejecutará
+                    state["abandoned"] = True
+                    self.queued -= 1
+            if started_at is not None:
+                wait_time = started_at - enqueued_at
+                run_time = finished - started_at
+                self.total_wait_time += wait_time
+                self.max_wait_time = max(self.max_wait_time, wait_time)
+                self.total_run_time += run_time
+                self.max_run_time = max(self.max_run_time, run_time)
+
+    def stats(self) -> Dict[str, Any]:
+        """Métricas de profundidad de cola y latencia del pool"""
+        finished = self.completed + self.failed
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "running": self.running,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self.total_wait_time / finished * 1000, 3) if finished else 0.0,
+            "max_wait_ms": round(self.max_wait_time * 1000, 3),
+            "avg_run_ms": round(self.total_run_time / finished * 1000, 3) if finished else 0.0,
+            "max_run_ms": round(self.max_run_time * 1000, 3),
+        }
+
+    def shutdown(self, wait: bool = False):
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait, cancel_futures=True)
+            self._pool = None
+        self._slots = None
+
+
+def _pool_from_env(name: str, default_workers: int, default_queue: int) -> BlockingExecutor:
+    prefix = f"TIDAL_{name.upper()}_POOL"
+    return BlockingExecutor(
+        name=name,
+        max_workers=int(os.getenv(f"{prefix}_WORKERS", default_workers)),
+        max_queue=int(os.getenv(f"{prefix}_QUEUE", default_queue)),
+        queue_timeout=float(os.getenv(f"{prefix}_QUEUE_TIMEOUT", 30)),
+    )
+
+
+# Pools separados para que las búsquedas masivas no dejen sin hilos al streaming
+executors: Dict[str, BlockingExecutor] = {
+    "metadata": _pool_from_env("metadata", default_workers=16, default_queue=512),
+    "stream": _pool_from_env("stream", default_workers=8, default_queue=256),
+    "cache": _pool_from_env("cache", default_workers=4, default_queue=1024),
+}
+
+
+async def run_blocking(pool: str, func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Ejecutar una llamada bloqueante en el pool indicado"""
+    return await executors[pool].run(func, *args, **kwargs)
+
+
+def executor_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: executor.stats() for name, executor in executors.items()}
+
+
+def shutdown_executors(wait: bool = False):
+    for executor in executors.values():
+        executor.shutdown(wait=wait)
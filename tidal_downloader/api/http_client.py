@@ -0,0 +1,57 @@
+import os
+from typing import Optional
+
+import aiohttp
+
+# Configuración del cliente HTTP compartido hacia el CDN de Tidal
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", 200))
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", 50))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", 60))
+HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", 300))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 10))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", 30))
+
+_session: Optional[aiohttp.ClientSession] = None
+
+
+def _create_session() -> aiohttp.ClientSession:
+    connector = aiohttp.TCPConnector(
+        limit=HTTP_MAX_CONNECTIONS,
+        limit_per_host=HTTP_MAX_CONNECTIONS_PER_HOST,
+        keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+        ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+        enable_cleanup_closed=True,
+    )
+    # Sin timeout total: las descargas largas solo fallan si el CDN deja de enviar datos
+    timeout = aiohttp.ClientTimeout(
+        total=None,
+        connect=HTTP_CONNECT_TIMEOUT,
+        sock_connect=HTTP_CONNECT_TIMEOUT,
+        sock_read=HTTP_READ_TIMEOUT,
+    )
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+
+async def start_http_client() -> aiohttp.ClientSession:
+    """Crear el cliente compartido (se llama desde el lifespan de la app)"""
+    global _session
+    if _session is None or _session.closed:
+        _session = _create_session()
+    return _session
+
+
+def get_http_client() -> aiohttp.ClientSession:
+    """Cliente HTTP con pool de conexiones para todas las transferencias al CDN"""
+    global _session
+    if _session is None or _session.closed:
+        # Uso fuera del lifespan (scripts, consola): crear bajo demanda
+        _session = _create_session()
+    return _session
+
+
+async def close_http_client():
+    """Cerrar el cliente compartido y sus conexiones abiertas"""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
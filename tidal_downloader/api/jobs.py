@@ -0,0 +1,302 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+from .executor import run_blocking
+from .log import get_logger
+from .models import OutputFormat
+from .tidal_service import TidalService, tidal_service, track_output_path
+
+# Configuración de los trabajos de descarga en segundo plano
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+JOB_TRACK_CONCURRENCY = int(os.getenv("JOB_TRACK_CONCURRENCY", 4))
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", "data/jobs.sqlite3")
+JOB_DOWNLOAD_DIR = os.getenv("JOB_DOWNLOAD_DIR", "downloads")
+# Intervalo mínimo en segundos entre eventos de progreso de un mismo trabajo
+JOB_PROGRESS_INTERVAL = float(os.getenv("JOB_PROGRESS_INTERVAL", 0.5))
+
+log = get_logger("jobs")
+
+TERMINAL_STATUSES = ("completed", "failed")
+
+
+def safe_filename(name: str) -> str:
+    return name.replace("/", "_").replace("\\", "_")
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    target_id: str
+    output_dir: str
+    format: str
+    status: str = "queued"
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+    total_tracks: int = 0
+    completed_tracks: int = 0
+    failed_tracks: int = 0
+    # Pistas que ya estaban descargadas de una ejecución anterior
+    skipped_tracks: int = 0
+    bytes_downloaded: int = 0
+    # Tiempo total de ffmpeg en las pistas recodificadas (mp3, m4a, wav)
+    encode_seconds: float = 0.0
+    files: List[str] = field(default_factory=list)
+    failures: List[Dict[str, Any]] = field(default_factory=list)
+    error: Optional[str] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    def summary(self) -> Dict[str, Any]:
+        """Estado sin las listas de archivos, para los eventos de progreso"""
+        data = self.to_dict()
+        del data["files"], data["failures"]
+        return data
+
+
+class JobStore:
+    """Cola persistente de trabajos en SQLite: los trabajos sobreviven a un reinicio"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY,"
+            " status TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " data TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+
+    def save(self, job: Job):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs (id, status, created_at, data) VALUES (?, ?, ?, ?)",
+                (job.id, job.status, job.created_at, json.dumps(job.to_dict())),
+            )
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return Job(**json.loads(row[0])) if row else None
+
+    def pending(self) -> List[Job]:
+        """Trabajos en cola o interrumpidos a medias, en orden de llegada"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM jobs WHERE status IN ('queued', 'running') ORDER BY created_at"
+            ).fetchall()
+        return [Job(**json.loads(row[0])) for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class JobManager:
+    """Ejecuta los trabajos de descarga con un número fijo de workers.
+
+    Además del límite de trabajos simultáneos (`workers`), las descargas de
+    pistas de todos los trabajos comparten un semáforo (`track_concurrency`)
+    para que un álbum o una playlist grande no acapare el ancho de banda.
+    """
+
+    def __init__(self, service: TidalService, store: JobStore, workers: int, track_concurrency: int):
+        self.service = service
+        self.store = store
+        self.workers = workers
+        self.track_concurrency = track_concurrency
+        self._queue: Optional[asyncio.Queue] = None
+        self._track_slots: Optional[asyncio.Semaphore] = None
+        self._tasks: List[asyncio.Task] = []
+        # Trabajos sin terminar, con el progreso en vivo
+        self._jobs: Dict[str, Job] = {}
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._last_publish: Dict[str, float] = {}
+
+    async def start(self):
+        """Arrancar los workers y reencolar los trabajos pendientes del último arranque"""
+        self._queue = asyncio.Queue()
+        self._track_slots = asyncio.Semaphore(self.track_concurrency)
+        for job in await run_blocking("cache", self.store.pending):
+            job.status = "queued"
+            self._jobs[job.id] = job
+            self._queue.put_nowait(job.id)
+        if self._jobs:
+            log.info("Trabajos pendientes reencolados", jobs=len(self._jobs))
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Detener los workers; los trabajos a medias quedan en la cola persistente"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, kind: str, target_id: str, output_dir: Optional[str] = None, format: OutputFormat = OutputFormat.flac) -> Job:
+        job = Job(
+            id=uuid.uuid4().hex,
+            kind=kind,
+            target_id=target_id,
+            output_dir=output_dir or JOB_DOWNLOAD_DIR,
+            format=format.value,
+        )
+        # Se persiste antes de responder para no perderlo si el proceso cae
+        await run_blocking("cache", self.store.save, job)
+        self._jobs[job.id] = job
+        self._queue.put_nowait(job.id)
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job
+        return await run_blocking("cache", self.store.get, job_id)
+
+    def subscribe(self, job_id: str) -> asyncio.Queue:
+        """Cola de eventos de progreso de un trabajo (para SSE)"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=16)
+        self._subscribers.setdefault(job_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, job_id: str, queue: asyncio.Queue):
+        subscribers = self._subscribers.get(job_id)
+        if subscribers is not None:
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[job_id]
+
+    def stats(self) -> Dict[str, Any]:
+        statuses = [job.status for job in self._jobs.values()]
+        return {
+            "workers": self.workers,
+            "track_concurrency": self.track_concurrency,
+            "queued": statuses.count("queued"),
+            "running": statuses.count("running"),
+            "subscribers": sum(len(queues) for queues in self._subscribers.values()),
+        }
+
+    def _publish(self, job: Job, force: bool = False):
+        job.updated_at = time.time()
+        subscribers = self._subscribers.get(job.id)
+        if not subscribers:
+            return
+        if not force and job.updated_at - self._last_publish.get(job.id, 0) < JOB_PROGRESS_INTERVAL:
+            return
+        self._last_publish[job.id] = job.updated_at
+        event = job.summary()
+        for queue in subscribers:
+            # Cada evento es una foto completa: si el cliente va lento se descarta la más antigua
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    async def _save(self, job: Job):
+        await run_blocking("cache", self.store.save, job)
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            job = self._jobs.get(job_id)
+            if job is None:
+                continue
+            try:
+                await self._run_job(job)
+                job.status = "failed" if job.completed_tracks == 0 else "completed"
+                if job.status == "failed" and not job.error:
+                    job.error = "No se pudo descargar ninguna pista"
+            except asyncio.CancelledError:
+                # Apagado: el trabajo sigue como "running" y se reanuda al arrancar
+                raise
+            except Exception as e:
+                log.error("Error en el trabajo", job_id=job.id, error=str(e))
+                job.status = "failed"
+                job.error = str(e)
+            await self._save(job)
+            self._publish(job, force=True)
+            self._jobs.pop(job.id, None)
+            self._last_publish.pop(job.id, None)
+
+    async def _run_job(self, job: Job):
+        job.status = "running"
+        await self._save(job)
+        self._publish(job, force=True)
+
+        name, tracks = await self.service.get_collection_tracks(job.kind, job.target_id)
+        directory = Path(job.output_dir)
+        if name:
+            directory = directory / safe_filename(name)
+        job.total_tracks = len(tracks)
+        # El progreso por pista no se persiste: al reanudar se recalcula a partir
+        # de los archivos ya terminados
+        job.completed_tracks = 0
+        job.failed_tracks = 0
+        job.skipped_tracks = 0
+        job.files = []
+        job.failures = []
+        await self._save(job)
+        self._publish(job, force=True)
+
+        await asyncio.gather(*(self._download(job, track, directory) for track in tracks))
+
+    async def _download(self, job: Job, track, directory: Path):
+        # El ID distingue pistas con el mismo título y artista (versiones en directo, remasters)
+        filename = f"{safe_filename(f'{track.name} - {track.artist.name} [{track.id}]')}.{job.format}"
+        # La misma ruta que escribe download_track, para que la reanudación la encuentre
+        output_path = Path(track_output_path(directory / filename, job.format))
+        # Los archivos finales se escriben con un rename atómico: si existe, está completo
+        if not output_path.exists():
+            async with self._track_slots:
+                reported = 0
+
+                def progress(written: int, total: Optional[int]):
+                    nonlocal reported
+                    job.bytes_downloaded += written - reported
+                    reported = written
+                    self._publish(job)
+
+                def encoded(seconds: float):
+                    job.encode_seconds += seconds
+
+                success = await self.service.download_track(
+                    str(track.id), str(output_path), OutputFormat(job.format), progress=progress, on_encode=encoded
+                )
+            if success and not output_path.exists():
+                # Sin el archivo en esta ruta, la reanudación volvería a descargar la pista
+                log.error("La pista descargada no está en la ruta esperada", job_id=job.id, path=str(output_path))
+                success = False
+            if not success:
+                job.failed_tracks += 1
+                job.failures.append({"id": track.id, "name": track.name, "artist": track.artist.name})
+                self._publish(job, force=True)
+                return
+        else:
+            job.skipped_tracks += 1
+
+        job.completed_tracks += 1
+        job.files.append(str(output_path))
+        self._publish(job, force=True)
+
+
+job_store = JobStore(JOB_DB_PATH)
+job_manager = JobManager(tidal_service, job_store, JOB_WORKERS, JOB_TRACK_CONCURRENCY)
@@ -0,0 +1,145 @@
+import json
+import logging
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+
+# Configuración del logging
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# "text" (clave=valor) o "json" (un objeto por línea)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+# Fracción de las líneas de depuración por elemento (pistas, álbumes...) que se emiten
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", 0.01))
+# Registros en espera de escribirse; si la cola se llena se descartan
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+
+ROOT_LOGGER = "tidal_api"
+
+# Argumentos propios de logging.Logger; el resto se guardan como campos del registro
+_LOGGER_KWARGS = {"exc_info", "stack_info", "stacklevel", "extra"}
+
+
+def _format_field(value: Any) -> str:
+    text = str(value)
+    if not text or any(char in text for char in ' "=\n\t'):
+        return json.dumps(text, ensure_ascii=False)
+    return text
+
+
+class StructuredFormatter(logging.Formatter):
+    """Una línea por registro: `clave=valor` o JSON, con los campos del registro"""
+
+    def __init__(self, json_output: bool = False):
+        super().__init__()
+        self.json_output = json_output
+
+    def format(self, record: logging.LogRecord) -> str:
+        data: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        data.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        if self.json_output:
+            return json.dumps(data, ensure_ascii=False, default=str)
+        return " ".join(f"{key}={_format_field(value)}" for key, value in data.items())
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Encola los registros sin formatearlos; nunca bloquea a quien escribe en el log.
+
+    El formateo y la escritura los hace el hilo del QueueListener. Si la
+    cola está llena el registro se descarta y se cuenta.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # El registro no sale del proceso: no hace falta formatearlo ni copiarlo aquí
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class StructuredLogger(logging.LoggerAdapter):
+    """Logger que acepta campos como argumentos: `log.info("Pista obtenida", track_id=id)`"""
+
+    def __init__(self, logger: logging.Logger):
+        super().__init__(logger, {})
+        self.sampled_out = 0
+
+    def process(self, msg, kwargs):
+        fields = {key: kwargs.pop(key) for key in list(kwargs) if key not in _LOGGER_KWARGS}
+        if fields:
+            kwargs["extra"] = {**kwargs.get("extra", {}), "fields": fields}
+        return msg, kwargs
+
+    def sample(self, msg: str, **kwargs):
+        """Línea de depuración por elemento: solo se emite una fracción LOG_SAMPLE_RATE"""
+        if not self.isEnabledFor(logging.DEBUG) or LOG_SAMPLE_RATE <= 0:
+            return
+        if LOG_SAMPLE_RATE < 1 and random.random() >= LOG_SAMPLE_RATE:
+            self.sampled_out += 1
+            return
+        self.debug(msg, sample_rate=LOG_SAMPLE_RATE, **kwargs)
+
+
+_queue: queue.Queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+_handler = NonBlockingQueueHandler(_queue)
+_output = logging.StreamHandler(sys.stdout)
+_output.setFormatter(StructuredFormatter(json_output=LOG_FORMAT == "json"))
+_listener: Optional[QueueListener] = None
+_loggers: Dict[str, StructuredLogger] = {}
+
+_root = logging.getLogger(ROOT_LOGGER)
+_root.setLevel(LOG_LEVEL)
+_root.addHandler(_handler)
+_root.propagate = False
+
+
+def get_logger(name: str) -> StructuredLogger:
+    """Logger `tidal_api.<name>`; sus registros se escriben desde el hilo del listener"""
+    logger = _loggers.get(name)
+    if logger is None:
+        logger = StructuredLogger(logging.getLogger(f"{ROOT_LOGGER}.{name}"))
+        _loggers[name] = logger
+    return logger
+
+
+def start_logging():
+    """Arrancar el hilo que escribe los registros encolados (incluidos los del arranque)"""
+    global _listener
+    if _listener is None:
+        _listener = QueueListener(_queue, _output)
+        _listener.start()
+
+
+def stop_logging():
+    """Escribir los registros pendientes y detener el hilo del listener"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def log_stats() -> Dict[str, Any]:
+    return {
+        "level": logging.getLevelName(_root.level),
+        "sample_rate": LOG_SAMPLE_RATE,
+        "queued": _queue.qsize(),
+        "dropped": _handler.dropped,
+        "sampled_out": sum(logger.sampled_out for logger in _loggers.values()),
+    }
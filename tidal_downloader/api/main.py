@@ -1,30 +1,78 @@
 from fastapi import FastAPI, HTTPException, status, Request, Depends, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse, JSONResponse, RedirectResponse
+from fastapi.responses import StreamingResponse, JSONResponse, RedirectResponse, Response
+from starlette.background import BackgroundTask
 import os
+import re
+import base64
+import hashlib
 from dotenv import load_dotenv
-from .tidal_service import tidal_service, cache_response
-import aiohttp
-from .models import OutputFormat, VerificationUri
-from typing import List, Dict, Any, Optional
+from .tidal_service import tidal_service, cache_response, decompress_response, response_cache, response_cache_backend, stream_manifest_cache, lyrics_cache, expiry_scheduler, NDJSON_MEDIA_TYPE, LISTING_PAGE_SIZE
+from .executor import executor_stats, shutdown_executors
+from .audio_cache import audio_cache, audio_cache_key
+from .prefetch import prefetcher
+from .transcoding import encoder_limiter, LiveTranscode, TranscodeError, TranscodeBusyError
+from .http_client import start_http_client, close_http_client, get_http_client
+from .models import OutputFormat, VerificationUri, TrackIds, JobRequest, StreamCodec
+from .jobs import job_manager, job_store, TERMINAL_STATUSES
+from .metrics import registry, cdn_bytes, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from .log import get_logger, start_logging, stop_logging, log_stats
+from typing import List, Dict, Any, Optional, Tuple
 import asyncio
 import json
 from datetime import datetime, timedelta
 import gzip
 from functools import lru_cache
+from contextlib import asynccontextmanager
 from .config import configure_app
 
 # Cargar variables de entorno
 load_dotenv()
 
-app = FastAPI(title="Tidal API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_logging()
+    await start_http_client()
+    expiry_scheduler.start()
+    await job_manager.start()
+    yield
+    await job_manager.stop()
+    await expiry_scheduler.stop()
+    await close_http_client()
+    # Liberar los hilos de los pools bloqueantes
+    shutdown_executors()
+    if response_cache_backend is not None:
+        response_cache_backend.close()
+    job_store.close()
+    # Al final, para escribir también los registros del apagado
+    stop_logging()
+
+app = FastAPI(title="Tidal API", lifespan=lifespan)
+
+log = get_logger("api")
+
+# Configuración de streaming
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", 64 * 1024))
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+CONTENT_RANGE_PATTERN = re.compile(r"^bytes (\d+)-(\d+)/(\d+|\*)$")
+
+# Consultas en lote
+BATCH_MAX_IDS = int(os.getenv("BATCH_MAX_IDS", 500))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", 16))
+PLAYLIST_RESOLVE_CONCURRENCY = int(os.getenv("PLAYLIST_RESOLVE_CONCURRENCY", 8))
+
+# Eventos de progreso de trabajos (SSE): comentario de keepalive si no hay novedades
+JOB_EVENTS_KEEPALIVE = float(os.getenv("JOB_EVENTS_KEEPALIVE", 15))
+
+# Paginación de listados: tamaño máximo de página en JSON
+LISTING_MAX_LIMIT = int(os.getenv("LISTING_MAX_LIMIT", 500))
 
 # Configurar la aplicación
 configure_app(app)
 
 # Función para verificar la sesión
 async def verify_session():
-    if not tidal_service.session.check_login():
+    if not await tidal_service.run(tidal_service.session.check_login):
         login_link = await tidal_service.get_login_link()
         if not login_link:
             raise HTTPException(
@@ -71,16 +119,16 @@ async def get_login_link_with_slash(force_new: bool = False):
 async def verify_login(verification: VerificationUri):
     """Verificar el login con el código de verificación"""
     try:
-        print(f"[VERIFY] Intentando verificar login con URI: {verification.get_uri()}")
+        log.info("Verificando login", uri=verification.get_uri())
         success = await tidal_service.process_login(verification.get_uri())
         if success:
-            print("[VERIFY] Login verificado exitosamente")
+            log.info("Login verificado")
             return {"status": "success", "message": "Login verificado exitosamente"}
         else:
-            print("[VERIFY] Error al verificar el login")
+            log.warning("No se pudo verificar el login")
             raise HTTPException(status_code=401, detail="Error al verificar el login")
     except Exception as e:
-        print(f"[VERIFY] Error inesperado: {str(e)}")
+        log.error("Error inesperado al verificar el login", error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/tidal/login/verify/{code}")
@@ -88,17 +136,17 @@ async def verify_login(verification: VerificationUri):
 async def verify_login_code(code: str):
     """Verificar el login con el código de verificación directamente en la URL"""
     try:
-        print(f"[VERIFY] Intentando verificar login con código: {code}")
+        log.info("Verificando login", code=code)
         verification_uri = f"link.tidal.com/{code}"
         success = await tidal_service.process_login(verification_uri)
         if success:
-            print("[VERIFY] Login verificado exitosamente")
+            log.info("Login verificado")
             return {"status": "success", "message": "Login verificado exitosamente"}
         else:
-            print("[VERIFY] Error al verificar el login")
+            log.warning("No se pudo verificar el login")
             raise HTTPException(status_code=401, detail="Error al verificar el login")
     except Exception as e:
-        print(f"[VERIFY] Error inesperado: {str(e)}")
+        log.error("Error inesperado al verificar el login", error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/tidal/login/verify/")
@@ -107,7 +155,7 @@ async def verify_login_with_slash(verification: VerificationUri):
     return RedirectResponse(url="/tidal/login/verify", status_code=status.HTTP_307_TEMPORARY_REDIRECT)
 
 @app.get("/tidal/track/{track_id}")
-@cache_response(expiration=timedelta(hours=1))
+@cache_response(expiration=timedelta(hours=1), stale_while_revalidate=timedelta(hours=6))
 async def get_track_info(track_id: str, _: bool = Depends(verify_session)):
     """Obtener información de una pista con caché"""
     track_info = await tidal_service.get_track_info(track_id)
@@ -118,6 +166,53 @@ async def get_track_info(track_id: str, _: bool = Depends(verify_session)):
         )
     return track_info
 
+async def get_tracks_batch(track_ids: List[str]) -> Dict[str, Any]:
+    """Obtener la información de varias pistas en paralelo, en el orden pedido"""
+    track_ids = [track_id.strip() for track_id in track_ids if track_id and track_id.strip()]
+    if not track_ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No se indicaron IDs de pistas"
+        )
+    if len(track_ids) > BATCH_MAX_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Se permiten como máximo {BATCH_MAX_IDS} IDs por petición"
+        )
+
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def fetch(track_id: str) -> Dict[str, Any]:
+        async with semaphore:
+            try:
+                # Misma caché y single-flight que /tidal/track/{track_id}
+                entry = await get_track_info.cached_entry(track_id=track_id, _=True)
+                return {"id": track_id, "status": status.HTTP_200_OK, "track": decompress_response(entry.data)}
+            except HTTPException as e:
+                return {"id": track_id, "status": e.status_code, "error": e.detail}
+            except Exception as e:
+                return {"id": track_id, "status": status.HTTP_500_INTERNAL_SERVER_ERROR, "error": str(e)}
+
+    results = await asyncio.gather(*(fetch(track_id) for track_id in track_ids))
+    return {
+        "total": len(results),
+        "found": sum(1 for result in results if result["status"] == status.HTTP_200_OK),
+        "tracks": results
+    }
+
+@app.get("/tidal/tracks")
+async def get_tracks(
+    ids: str = Query(..., description="IDs de pistas separados por comas"),
+    _: bool = Depends(verify_session)
+):
+    """Obtener información de varias pistas en una sola petición"""
+    return await get_tracks_batch(ids.split(","))
+
+@app.post("/tidal/tracks")
+async def post_tracks(body: TrackIds, _: bool = Depends(verify_session)):
+    """Obtener información de varias pistas en una sola petición (IDs en el cuerpo)"""
+    return await get_tracks_batch(body.ids)
+
 @app.get("/tidal/track/{track_id}/lyrics")
 async def get_track_lyrics(track_id: str):
     lyrics = await tidal_service.get_lyrics(track_id)
@@ -137,7 +232,7 @@ async def get_track_download_info(track_id: str, cover_size: int = 1280):
         cover_size: Tamaño de la portada (80, 160, 320, 640, 1280). Por defecto 1280.
     """
     try:
-        track = tidal_service.session.track(track_id)
+        track = await tidal_service.run(tidal_service.session.track, track_id)
         stream_url = await tidal_service.get_stream_url(track_id)
         lyrics = await tidal_service.get_lyrics(track_id)
         cover_url = await tidal_service.get_album_cover_url(track, size=cover_size)
@@ -165,37 +260,282 @@ async def get_track_download_info(track_id: str, cover_size: int = 1280):
             detail=f"Error al obtener información de descarga: {str(e)}"
         )
 
+def parse_range_header(range_header: Optional[str]) -> Optional[str]:
+    """Normalizar un header Range de un único rango de bytes.
+
+    Devuelve None si no hay header o no es un rango simple válido; en ese caso
+    se sirve el archivo completo, como permite el RFC 9110.
+    """
+    if not range_header:
+        return None
+    match = RANGE_PATTERN.match(range_header.strip())
+    if not match:
+        return None
+    start, end = match.group(1), match.group(2)
+    if not start and not end:
+        return None
+    if start and end and int(end) < int(start):
+        return None
+    return f"bytes={start}-{end}"
+
+def resolve_byte_range(byte_range: str, total: int) -> Optional[Tuple[int, int]]:
+    """Inicio y fin (incluidos) de un Range normalizado para un archivo de `total` bytes.
+
+    Devuelve None si el rango no es satisfacible.
+    """
+    start, end = byte_range[len("bytes="):].split("-")
+    if not start:
+        suffix = int(end)
+        return (max(0, total - suffix), total - 1) if suffix else None
+    if int(start) >= total:
+        return None
+    return int(start), min(int(end), total - 1) if end else total - 1
+
+def upstream_start(response) -> Tuple[int, Optional[int]]:
+    """Posición inicial y tamaño total del archivo según la respuesta del CDN"""
+    if response.status == status.HTTP_206_PARTIAL_CONTENT:
+        match = CONTENT_RANGE_PATTERN.match(response.headers.get("Content-Range", ""))
+        if not match:
+            return -1, None
+        return int(match.group(1)), int(match.group(3)) if match.group(3) != "*" else None
+    return 0, response.content_length
+
+async def open_upstream(stream_url: str, byte_range: Optional[str]):
+    """Abrir la respuesta del CDN para el rango pedido, traduciendo sus errores"""
+    upstream_headers = {"Accept-Encoding": "identity"}
+    if byte_range:
+        upstream_headers["Range"] = byte_range
+
+    response = await get_http_client().get(stream_url, headers=upstream_headers)
+    if response.status == status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE:
+        content_range = response.headers.get("Content-Range")
+        response.release()
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail="Rango no válido",
+            headers={"Content-Range": content_range} if content_range else None
+        )
+    if response.status not in (status.HTTP_200_OK, status.HTTP_206_PARTIAL_CONTENT):
+        response.release()
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail=f"El CDN respondió con estado {response.status}"
+        )
+    return response
+
+async def cached_stream_response(cache_key: str, stream_url: str, request: Request, headers: Dict[str, str]) -> StreamingResponse:
+    """Servir el audio desde la caché en disco y el CDN.
+
+    Los bytes ya guardados se leen de disco; el resto se pide al CDN y, si
+    continúa el prefijo guardado, se escribe en la caché mientras se envía.
+    Si el cliente se va antes del final, la pista se completa en segundo plano.
+    """
+    byte_range = parse_range_header(request.headers.get("range"))
+    entry = audio_cache.lookup(cache_key)
+    disk_start = disk_end = None
+
+    if entry is not None and entry.size > 0:
+        bounds = resolve_byte_range(byte_range, entry.total_size) if byte_range else (0, entry.total_size - 1)
+        if bounds is None:
+            raise HTTPException(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                detail="Rango no válido",
+                headers={"Content-Range": f"bytes */{entry.total_size}"}
+            )
+        start, end = bounds
+        if start < entry.size:
+            disk_start, disk_end = start, min(end, entry.size - 1)
+            headers["Content-Length"] = str(end - start + 1)
+            if byte_range:
+                headers["Content-Range"] = f"bytes {start}-{end}/{entry.total_size}"
+            status_code = status.HTTP_206_PARTIAL_CONTENT if byte_range else status.HTTP_200_OK
+
+            if disk_end == end:
+                audio_cache.hits += 1
+                return StreamingResponse(
+                    audio_cache.read(cache_key, start, end, STREAM_CHUNK_SIZE),
+                    status_code=status_code,
+                    media_type=entry.content_type,
+                    headers=headers
+                )
+            # El resto, desde el final del prefijo guardado
+            byte_range = f"bytes={disk_end + 1}-{end}"
+
+    response = await open_upstream(stream_url, byte_range)
+    offset, total = upstream_start(response)
+    content_type = response.headers.get("Content-Type", "audio/mpeg")
+    if disk_start is not None:
+        if response.status != status.HTTP_206_PARTIAL_CONTENT or offset != disk_end + 1:
+            response.release()
+            raise HTTPException(
+                status_code=status.HTTP_502_BAD_GATEWAY,
+                detail="El CDN no respetó el rango pedido"
+            )
+        audio_cache.partial_hits += 1
+        content_type = entry.content_type
+    else:
+        audio_cache.misses += 1
+        status_code = response.status
+        for header in ("Content-Length", "Content-Range"):
+            if header in response.headers:
+                headers[header] = response.headers[header]
+
+    writer = await audio_cache.open_writer(cache_key, offset, total, content_type)
+
+    async def finish():
+        response.release()
+        if writer is not None and not writer.closed:
+            await writer.close()
+            if not writer.entry.complete:
+                audio_cache.fill_in_background(cache_key, stream_url)
+
+    async def stream_generator():
+        try:
+            if disk_start is not None:
+                async for chunk in audio_cache.read(cache_key, disk_start, disk_end, STREAM_CHUNK_SIZE):
+                    yield chunk
+            async for chunk in response.content.iter_chunked(STREAM_CHUNK_SIZE):
+                audio_cache.bytes_from_cdn += len(chunk)
+                cdn_bytes.inc("stream", amount=len(chunk))
+                if writer is not None:
+                    await writer.write(chunk)
+                yield chunk
+        finally:
+            await finish()
+
+    return StreamingResponse(
+        stream_generator(),
+        status_code=status_code,
+        media_type=content_type,
+        headers=headers,
+        # Si el cliente se desconecta, devolver la conexión al pool y cerrar la escritura en caché
+        background=BackgroundTask(finish)
+    )
+
+async def transcoded_stream_response(track_id: str, stream_url: str, codec: StreamCodec, bitrate: Optional[int], track_headers: Dict[str, str]) -> StreamingResponse:
+    """Stream recodificado al vuelo con ffmpeg (sin Range: la salida no tiene tamaño conocido)"""
+    transcode = LiveTranscode(codec.value, bitrate)
+    try:
+        await transcode.start()
+    except TranscodeBusyError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "5"}
+        )
+    except TranscodeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
+
+    try:
+        response = await get_http_client().get(stream_url, headers={"Accept-Encoding": "identity"})
+    except Exception:
+        await transcode.close()
+        raise
+    if response.status != status.HTTP_200_OK:
+        response.release()
+        await transcode.close()
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail=f"El CDN respondió con estado {response.status}"
+        )
+
+    async def source():
+        async for chunk in response.content.iter_chunked(STREAM_CHUNK_SIZE):
+            cdn_bytes.inc("transcode", amount=len(chunk))
+            yield chunk
+
+    async def stream_generator():
+        try:
+            async for chunk in transcode.stream(source(), STREAM_CHUNK_SIZE):
+                yield chunk
+        finally:
+            response.release()
+
+    async def cleanup():
+        response.release()
+        await transcode.close()
+
+    headers = {
+        "Accept-Ranges": "none",
+        "Content-Disposition": f'attachment; filename="{track_id}.{transcode.extension}"',
+        "X-Transcoded": f"{transcode.codec}; bitrate={transcode.bitrate}k",
+        **track_headers
+    }
+    return StreamingResponse(
+        stream_generator(),
+        media_type=transcode.media_type,
+        headers=headers,
+        # Si el cliente se desconecta, matar ffmpeg y devolver la conexión al pool
+        background=BackgroundTask(cleanup)
+    )
+
+def lyrics_headers(track_id: str) -> Dict[str, str]:
+    """Referencia a las letras para las cabeceras del stream, sin esperar a Tidal.
+
+    Si ya están en caché se envía su URL, un hash corto del texto y el
+    idioma; si aún no se conocen se envía solo la URL y se cargan en segundo
+    plano para cuando el cliente las pida.
+    """
+    lyrics_url = f"/tidal/track/{track_id}/lyrics"
+    known, lyrics = tidal_service.peek_lyrics(track_id)
+    if not known:
+        tidal_service.warm_lyrics(track_id)
+        return {"X-Lyrics-Url": lyrics_url}
+    if not lyrics or not lyrics.get("lyrics"):
+        return {}
+    return {
+        "X-Lyrics-Url": lyrics_url,
+        "X-Lyrics-Hash": hashlib.sha256(lyrics["lyrics"].encode()).hexdigest()[:16],
+        "X-Lyrics-Language": lyrics.get("language") or ""
+    }
+
 @app.get("/tidal/stream/{track_id}")
-async def stream_track(track_id: str):
+async def stream_track(
+    track_id: str,
+    request: Request,
+    codec: Optional[StreamCodec] = None,
+    bitrate: Optional[int] = Query(None, ge=32, le=320, description="Bitrate en kbps al recodificar"),
+    context: Optional[str] = Query(None, description="playlist:<id>, mix:<id> o album:<id> para precargar las siguientes pistas")
+):
+    """Stream de una pista; con `codec`/`bitrate` se recodifica al vuelo (AAC u Opus)"""
     try:
-        track = tidal_service.session.track(track_id)
-        stream_url = await tidal_service.get_stream_url(track_id)
-        lyrics = await tidal_service.get_lyrics(track_id)
+        track, manifest = await asyncio.gather(
+            tidal_service.run(tidal_service.session.track, track_id, pool="stream"),
+            tidal_service.get_stream_manifest(track_id)
+        )
         
-        if not stream_url:
+        if not manifest:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Pista no encontrada o no disponible para streaming"
             )
+        stream_url = manifest.url
+        if context:
+            # La precarga va en segundo plano: no retrasa este stream
+            prefetcher.hint(context, track_id)
 
-        async def stream_generator():
-            async with aiohttp.ClientSession() as session:
-                async with session.get(stream_url) as response:
-                    async for chunk in response.content.iter_chunked(8192):
-                        yield chunk
-
-        return StreamingResponse(
-            stream_generator(),
-            media_type="audio/mpeg",
-            headers={
-                "Content-Disposition": f'attachment; filename="{track_id}.mp3"',
-                "X-Track-Name": track.name,
-                "X-Artist-Name": track.artist.name,
-                "X-Album-Name": track.album.name,
-                "X-Lyrics": lyrics.get("lyrics") if lyrics else "",
-                "X-Lyrics-Language": lyrics.get("language") if lyrics else ""
-            }
-        )
+        track_headers = {
+            "X-Track-Name": track.name,
+            "X-Artist-Name": track.artist.name,
+            "X-Album-Name": track.album.name,
+            **lyrics_headers(track_id)
+        }
+
+        if codec is not None or bitrate is not None:
+            return await transcoded_stream_response(track_id, stream_url, codec or StreamCodec.aac, bitrate, track_headers)
+
+        headers = {
+            "Accept-Ranges": "bytes",
+            "Content-Disposition": f'attachment; filename="{track_id}.mp3"',
+            **track_headers
+        }
+        cache_key = audio_cache_key(track_id, manifest.quality)
+        return await cached_stream_response(cache_key, stream_url, request, headers)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -212,15 +552,71 @@ async def download_track(track_id: str, output_path: str, format: OutputFormat =
         )
     return {"message": "Pista descargada exitosamente", "path": f"{output_path}.{format}"}
 
+@app.post("/tidal/jobs", status_code=status.HTTP_202_ACCEPTED)
+async def create_job(job_request: JobRequest):
+    """Encolar la descarga de una pista, un álbum o una playlist en segundo plano"""
+    job = await job_manager.submit(job_request.type.value, job_request.id, job_request.output_dir, job_request.format)
+    return job.to_dict()
+
+@app.get("/tidal/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Estado y resultado de un trabajo de descarga"""
+    job = await job_manager.get(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Trabajo no encontrado"
+        )
+    return job.to_dict()
+
+def sse_event(event: str, data: Dict[str, Any]) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode()
+
+@app.get("/tidal/jobs/{job_id}/events")
+async def get_job_events(job_id: str):
+    """Progreso de un trabajo como Server-Sent Events hasta que termina"""
+    if not await job_manager.get(job_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Trabajo no encontrado"
+        )
+
+    async def event_generator():
+        # Suscribirse antes de leer el estado para no perder eventos intermedios
+        queue = job_manager.subscribe(job_id)
+        try:
+            job = await job_manager.get(job_id)
+            yield sse_event(job.status if job.finished else "progress", job.summary())
+            if job.finished:
+                return
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=JOB_EVENTS_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                finished = event["status"] in TERMINAL_STATUSES
+                yield sse_event(event["status"] if finished else "progress", event)
+                if finished:
+                    return
+        finally:
+            job_manager.unsubscribe(job_id, queue)
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/tidal/search")
-@cache_response(expiration=timedelta(minutes=30))
+@cache_response(expiration=timedelta(minutes=30), stale_while_revalidate=timedelta(hours=2))
 async def search_tracks(
     query: str = Query(..., description="Término de búsqueda"),
     limit: int = Query(10, ge=1, le=100, description="Número máximo de resultados")
 ):
     """Buscar canciones por nombre con caché"""
     try:
-        print(f"[API] Búsqueda recibida - query: {query}, limit: {limit}")
+        log.debug("Búsqueda recibida", query=query, limit=limit)
         tracks = await tidal_service.search_tracks(query, limit)
         if not tracks:
             raise HTTPException(
@@ -233,7 +629,7 @@ async def search_tracks(
             "tracks": tracks
         }
     except Exception as e:
-        print(f"[API] Error en búsqueda: {str(e)}")
+        log.error("Error en búsqueda", query=query, error=str(e))
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error al realizar la búsqueda: {str(e)}"
@@ -278,37 +674,194 @@ async def get_playlist_info(playlist_id: str):
         )
     return playlist_info
 
+def wants_ndjson(request: Request) -> bool:
+    """El cliente pide la variante en streaming (una línea JSON por elemento)"""
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+def ndjson_line(data: Dict[str, Any]) -> bytes:
+    return (json.dumps(data) + "\n").encode()
+
+def encode_cursor(offset: int) -> str:
+    return base64.urlsafe_b64encode(f"offset:{offset}".encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> int:
+    """Posición guardada en un cursor opaco devuelto como `next_cursor`"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        prefix, _, offset = raw.partition(":")
+        if prefix != "offset" or not offset.isdigit():
+            raise ValueError(raw)
+        return int(offset)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor no válido"
+        )
+
+def is_paged_request(request: Request, offset: int, limit: Optional[int], cursor: Optional[str]) -> bool:
+    """Sin parámetros de paginación ni NDJSON se mantiene la respuesta completa de siempre"""
+    return wants_ndjson(request) or offset > 0 or limit is not None or cursor is not None
+
+async def listing_page_response(
+    request: Request,
+    kind: str,
+    header: Dict[str, Any],
+    total: int,
+    pages,
+    offset: int,
+    limit: Optional[int]
+):
+    """Respuesta paginada de un listado de pistas.
+
+    En JSON devuelve una página (como mucho `limit` pistas) con `next_cursor`;
+    con `Accept: application/x-ndjson` envía una línea por pista según llegan
+    las páginas de Tidal, hasta `limit` o el final del listado.
+    """
+    end = total if limit is None else min(total, offset + limit)
+    next_cursor = encode_cursor(end) if end < total else None
+
+    if wants_ndjson(request):
+        async def ndjson_generator():
+            yield ndjson_line({"type": kind, **header, "total_tracks": total})
+            position = offset
+            try:
+                async for page in pages:
+                    for track in page:
+                        yield ndjson_line({"type": "track", "position": position, **track})
+                        position += 1
+            except Exception as e:
+                yield ndjson_line({"type": "error", "position": position, "error": str(e)})
+                return
+            yield ndjson_line({"type": "end", "next_cursor": next_cursor})
+
+        return StreamingResponse(ndjson_generator(), media_type=NDJSON_MEDIA_TYPE)
+
+    try:
+        tracks = [track async for page in pages for track in page]
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al obtener las pistas: {str(e)}"
+        )
+    return {
+        **header,
+        "total_tracks": total,
+        "offset": offset,
+        "limit": limit,
+        "next_cursor": next_cursor,
+        "tracks": tracks
+    }
+
+def page_bounds(request: Request, offset: int, limit: Optional[int], cursor: Optional[str]):
+    """Posición inicial y tamaño de página a partir de offset/limit/cursor"""
+    if cursor is not None:
+        offset = decode_cursor(cursor)
+    if limit is None and not wants_ndjson(request):
+        # En JSON la página siempre está acotada; NDJSON puede recorrer todo el listado
+        limit = LISTING_PAGE_SIZE
+    return offset, limit
+
 @app.get("/tidal/playlist/{playlist_id}/tracks")
-async def get_playlist_tracks(playlist_id: str):
-    tracks = await tidal_service.get_playlist_tracks(playlist_id)
-    if not tracks:
+async def get_playlist_tracks(
+    playlist_id: str,
+    request: Request,
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=LISTING_MAX_LIMIT),
+    cursor: Optional[str] = None
+):
+    """Pistas de una playlist.
+
+    Sin parámetros devuelve la lista completa como siempre; con
+    `offset`/`limit`/`cursor` o `Accept: application/x-ndjson` pagina.
+    """
+    if not is_paged_request(request, offset, limit, cursor):
+        tracks = await tidal_service.get_playlist_tracks(playlist_id)
+        if not tracks:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="No se encontraron pistas en la playlist"
+            )
+        return tracks
+
+    offset, limit = page_bounds(request, offset, limit, cursor)
+    listing = await tidal_service.get_playlist_track_pages(playlist_id, offset, limit)
+    if listing is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="No se encontraron pistas en la playlist"
+            detail="Playlist no encontrada"
         )
-    return tracks
+    total, pages = listing
+    return await listing_page_response(request, "playlist", {"playlist_id": playlist_id}, total, pages, offset, limit)
+
+def playlist_track_download_info(track, stream_url: str) -> Dict[str, Any]:
+    return {
+        "id": track.id,
+        "name": track.name,
+        "artist": track.artist.name,
+        "album": track.album.name,
+        "stream_url": stream_url,
+        "duration": track.duration
+    }
 
 @app.get("/tidal/playlist/{playlist_id}/download-info")
-async def get_playlist_download_info(playlist_id: str):
-    """Obtiene la información necesaria para descargar cada pista de la playlist"""
+async def get_playlist_download_info(playlist_id: str, request: Request):
+    """Obtiene la información necesaria para descargar cada pista de la playlist
+
+    Con `Accept: application/x-ndjson` se envía una línea por pista en cuanto
+    se resuelve su URL, en lugar de esperar a la playlist completa.
+    """
     try:
-        playlist = tidal_service.session.playlist(playlist_id)
-        tracks_info = []
-        
-        for track in playlist.tracks():
-            stream_url = await tidal_service.get_stream_url(track.id)
-            if stream_url:
-                tracks_info.append({
-                    "id": track.id,
-                    "name": track.name,
-                    "artist": track.artist.name,
-                    "album": track.album.name,
-                    "stream_url": stream_url,
-                    "duration": track.duration
-                })
+        # Por páginas: playlist.tracks() sin paginar solo devuelve la primera página
+        playlist_name, tracks = await tidal_service.get_collection_tracks("playlist", playlist_id)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al obtener información de descarga: {str(e)}"
+        )
+
+    # Resolver los manifiestos en paralelo con concurrencia acotada
+    semaphore = asyncio.Semaphore(PLAYLIST_RESOLVE_CONCURRENCY)
+
+    async def resolve(track) -> Optional[str]:
+        async with semaphore:
+            return await tidal_service.get_stream_url(track.id)
+
+    if wants_ndjson(request):
+        async def ndjson_generator():
+            yield ndjson_line({"type": "playlist", "playlist_name": playlist_name, "total_tracks": len(tracks)})
+            positions = {asyncio.ensure_future(resolve(track)): position for position, track in enumerate(tracks)}
+            pending = set(positions)
+            resolved = 0
+            try:
+                while pending:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        position = positions[task]
+                        track = tracks[position]
+                        stream_url = task.result() if not task.exception() else None
+                        if stream_url:
+                            resolved += 1
+                            yield ndjson_line({"type": "track", "position": position, **playlist_track_download_info(track, stream_url)})
+                        else:
+                            yield ndjson_line({"type": "error", "position": position, "id": track.id, "error": "URL no disponible"})
+                yield ndjson_line({"type": "end", "total_tracks": resolved})
+            finally:
+                # Cliente desconectado: no seguir resolviendo
+                for task in pending:
+                    task.cancel()
+
+        return StreamingResponse(ndjson_generator(), media_type=NDJSON_MEDIA_TYPE)
+
+    try:
+        stream_urls = await asyncio.gather(*(resolve(track) for track in tracks))
+        tracks_info = [
+            playlist_track_download_info(track, stream_url)
+            for track, stream_url in zip(tracks, stream_urls)
+            if stream_url
+        ]
         
         return {
-            "playlist_name": playlist.name,
+            "playlist_name": playlist_name,
             "total_tracks": len(tracks_info),
             "tracks": tracks_info
         }
@@ -344,8 +897,25 @@ async def get_mix_info(mix_id: str):
     return mix_info
 
 @app.get("/tidal/mix/{mix_id}/tracks")
-async def get_mix_tracks(mix_id: str):
+async def get_mix_tracks(
+    mix_id: str,
+    request: Request,
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=LISTING_MAX_LIMIT),
+    cursor: Optional[str] = None
+):
     """Obtener las pistas de un mix específico"""
+    if is_paged_request(request, offset, limit, cursor):
+        offset, limit = page_bounds(request, offset, limit, cursor)
+        listing = await tidal_service.get_mix_track_pages(mix_id, offset, limit)
+        if listing is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Mix no encontrado"
+            )
+        total, pages = listing
+        return await listing_page_response(request, "mix", {"mix_id": mix_id}, total, pages, offset, limit)
+
     tracks = await tidal_service.get_mix_tracks(mix_id)
     if not tracks:
         raise HTTPException(
@@ -359,8 +929,26 @@ async def get_mix_tracks(mix_id: str):
     }
 
 @app.get("/tidal/album/{album_id}")
-async def get_album_info(album_id: str):
+@cache_response(expiration=timedelta(hours=1), stale_while_revalidate=timedelta(hours=6))
+async def get_album_info(
+    album_id: str,
+    request: Request,
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=LISTING_MAX_LIMIT),
+    cursor: Optional[str] = None
+):
     """Obtener información detallada de un álbum"""
+    if is_paged_request(request, offset, limit, cursor):
+        offset, limit = page_bounds(request, offset, limit, cursor)
+        listing = await tidal_service.get_album_track_pages(album_id, offset, limit)
+        if listing is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Álbum no encontrado"
+            )
+        album_info, pages = listing
+        return await listing_page_response(request, "album", album_info, album_info["number_of_tracks"], pages, offset, limit)
+
     album_info = await tidal_service.get_album_info(album_id)
     if not album_info:
         raise HTTPException(
@@ -414,6 +1002,7 @@ async def search_albums_by_artist_with_slash(title: str, artist: str, limit: int
     )
 
 @app.get("/tidal/user/playlists")
+@cache_response(expiration=timedelta(minutes=5), private=True)
 async def get_user_playlists():
     """Obtener todas las playlists del usuario"""
     playlists = await tidal_service.get_user_playlists()
@@ -430,4 +1019,84 @@ async def get_user_playlists():
 @app.get("/tidal/user/playlists/")
 async def get_user_playlists_with_slash():
     """Redirigir a la ruta sin slash"""
-    return RedirectResponse(url="/tidal/user/playlists", status_code=status.HTTP_307_TEMPORARY_REDIRECT) 
\ No newline at end of file
+    return RedirectResponse(url="/tidal/user/playlists", status_code=status.HTTP_307_TEMPORARY_REDIRECT)
+
+@app.get("/stats")
+async def get_stats():
+    """Métricas internas del servicio (pools de ejecución y cachés)"""
+    return {
+        "executors": executor_stats(),
+        "response_cache": response_cache.stats(),
+        "cache_expiry": expiry_scheduler.stats(),
+        "response_cache_backend": response_cache_backend.stats() if response_cache_backend else None,
+        "stream_manifest_cache": stream_manifest_cache.stats(),
+        "lyrics_cache": lyrics_cache.stats(),
+        "jobs": job_manager.stats(),
+        "transcoding": encoder_limiter.stats(),
+        "audio_cache": audio_cache.stats(),
+        "prefetch": prefetcher.stats(),
+        "logging": log_stats()
+    }
+
+# Métricas calculadas en cada scrape a partir de las estadísticas de /stats
+def _response_cache_samples(field: str):
+    for endpoint, stats in response_cache.stats()["endpoints"].items():
+        yield (endpoint,), stats[field]
+
+def _executor_samples(field: str):
+    for pool, stats in executor_stats().items():
+        yield (pool,), stats[field]
+
+def _stats_samples(stats_func, field: str):
+    yield (), stats_func()[field]
+
+def register_stats_metrics():
+    """Registrar las métricas que se leen de las estadísticas de /stats"""
+    for field, kind, help_text in (
+        ("hits", "counter", "Aciertos de la caché de respuestas"),
+        ("misses", "counter", "Fallos de la caché de respuestas"),
+        ("coalesced", "counter", "Peticiones agrupadas con otra idéntica en curso"),
+        ("stale_hits", "counter", "Respuestas obsoletas servidas mientras se revalidan"),
+        ("entries", "gauge", "Entradas en la caché de respuestas"),
+        ("bytes", "gauge", "Bytes comprimidos en la caché de respuestas"),
+    ):
+        suffix = "_total" if kind == "counter" else ""
+        registry.callback(
+            f"tidal_api_response_cache_{field}{suffix}", help_text, kind, ("endpoint",),
+            lambda field=field: _response_cache_samples(field),
+        )
+
+    for field, kind, help_text in (
+        ("queue_depth", "gauge", "Tareas esperando un hilo del pool"),
+        ("running", "gauge", "Tareas ejecutándose en el pool"),
+        ("rejected", "counter", "Tareas rechazadas por cola llena"),
+    ):
+        suffix = "_total" if kind == "counter" else ""
+        registry.callback(
+            f"tidal_api_executor_{field}{suffix}", help_text, kind, ("pool",),
+            lambda field=field: _executor_samples(field),
+        )
+
+    for name, stats_func, field, kind, help_text in (
+        ("audio_cache_bytes", audio_cache.stats, "bytes", "gauge", "Bytes de audio en la caché de disco"),
+        ("audio_cache_hits_total", audio_cache.stats, "hits", "counter", "Streams servidos por completo desde disco"),
+        ("audio_cache_partial_hits_total", audio_cache.stats, "partial_hits", "counter", "Streams servidos en parte desde disco"),
+        ("audio_cache_misses_total", audio_cache.stats, "misses", "counter", "Streams servidos desde el CDN"),
+        ("audio_cache_bytes_saved_total", audio_cache.stats, "bytes_saved", "counter", "Bytes servidos desde disco en vez del CDN"),
+        ("encoders_running", encoder_limiter.stats, "running", "gauge", "Procesos ffmpeg en ejecución"),
+        ("encoders_waiting", encoder_limiter.stats, "waiting", "gauge", "Peticiones esperando un codificador libre"),
+        ("jobs_queued", job_manager.stats, "queued", "gauge", "Trabajos de descarga en cola"),
+        ("jobs_running", job_manager.stats, "running", "gauge", "Trabajos de descarga en curso"),
+        ("prefetch_bytes_total", prefetcher.stats, "bytes_prefetched", "counter", "Bytes de audio precargados"),
+    ):
+        registry.callback(
+            f"tidal_api_{name}", help_text, kind, (),
+            lambda stats_func=stats_func, field=field: _stats_samples(stats_func, field),
+        )
+
+register_stats_metrics()
+
+@app.get("/metrics")
+async def get_metrics():
+    """Métricas en formato de texto de Prometheus"""
+    return Response(registry.render(), media_type=METRICS_CONTENT_TYPE)
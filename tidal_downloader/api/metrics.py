@@ -0,0 +1,187 @@
+import bisect
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Métricas en formato de texto de Prometheus, sin dependencias externas
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[Any]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric(ABC):
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Sequence[Any]) -> LabelValues:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} espera las etiquetas {self.labelnames}")
+        return tuple(str(label) for label in labels)
+
+    @abstractmethod
+    def samples(self) -> Iterable[Tuple[str, Sequence[str], Sequence[Any], float]]:
+        """(nombre, etiquetas, valores de las etiquetas, valor) de cada serie"""
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for name, labelnames, labels, value in self.samples():
+            lines.append(f"{name}{_format_labels(labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: Any, amount: float = 1):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        for labels, value in self._values.items():
+            yield self.name, self.labelnames, labels, value
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, *labels: Any, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels: Any, value: float):
+        self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Por combinación de etiquetas: cuentas por bucket (no acumuladas), suma y total
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labels: Any):
+        key = self._key(labels)
+        state = self._values.get(key)
+        if state is None:
+            state = ([0] * (len(self.buckets) + 1), [0.0, 0])
+            self._values[key] = state
+        counts, totals = state
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        totals[0] += value
+        totals[1] += 1
+
+    def samples(self):
+        bucket_labelnames = self.labelnames + ("le",)
+        for labels, (counts, totals) in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                yield f"{self.name}_bucket", bucket_labelnames, labels + (_format_value(bound),), cumulative
+            yield f"{self.name}_sum", self.labelnames, labels, totals[0]
+            yield f"{self.name}_count", self.labelnames, labels, totals[1]
+
+
+class CallbackMetric(Metric):
+    """Métrica cuyos valores se calculan al hacer scrape a partir de otras estadísticas"""
+
+    def __init__(self, name: str, help: str, type: str, labelnames: Sequence[str], collect: Callable[[], Iterable[Tuple[Sequence[Any], float]]]):
+        super().__init__(name, help, labelnames)
+        self.type = type
+        self.collect = collect
+
+    def samples(self):
+        for labels, value in self.collect():
+            yield self.name, self.labelnames, self._key(labels), value
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Métrica duplicada: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def callback(self, name: str, help: str, type: str, labelnames: Sequence[str], collect: Callable[[], Iterable[Tuple[Sequence[Any], float]]]) -> CallbackMetric:
+        return self.register(CallbackMetric(name, help, type, labelnames, collect))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                # Un recolector roto no debe dejar sin métricas al resto
+                lines.append(f"# ERROR {metric.name}: {_escape(e)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# Peticiones HTTP por ruta (plantilla de la ruta, no la URL, para acotar la cardinalidad)
+http_requests = registry.counter(
+    "tidal_api_http_requests_total", "Peticiones HTTP atendidas", ("method", "route", "status")
+)
+http_request_duration = registry.histogram(
+    "tidal_api_http_request_duration_seconds", "Duración de las peticiones HTTP hasta el último byte", ("method", "route")
+)
+http_in_flight = registry.gauge(
+    "tidal_api_http_requests_in_flight", "Peticiones HTTP en curso", ("method", "route")
+)
+
+# Llamadas a la API de Tidal (tidalapi) por método
+upstream_calls = registry.counter(
+    "tidal_api_upstream_calls_total", "Llamadas a tidalapi", ("method", "outcome")
+)
+upstream_call_duration = registry.histogram(
+    "tidal_api_upstream_call_duration_seconds", "Duración de las llamadas a tidalapi, incluida la espera en el pool", ("method",)
+)
+
+# Bytes transferidos desde el CDN de Tidal
+cdn_bytes = registry.counter(
+    "tidal_api_cdn_bytes_total", "Bytes recibidos del CDN de Tidal", ("path",)
+)
+
+
+def method_name(func: Callable[..., Any]) -> str:
+    """Nombre corto de una función para usarlo como etiqueta (p. ej. `Session.track`)"""
+    name = getattr(func, "__qualname__", None) or getattr(func, "__name__", None) or type(func).__name__
+    return name.replace("<locals>.", "")
@@ -3,6 +3,13 @@ from fastapi.responses import JSONResponse
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import Response
 import json
+import time
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from .metrics import http_requests, http_request_duration, http_in_flight
+from .log import get_logger
+
+log = get_logger("middleware")
 
 class SessionVerificationMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next):
@@ -15,7 +22,7 @@ class SessionVerificationMiddleware(BaseHTTPMiddleware):
             # La verificación real de sesión se hará en los endpoints
             return await call_next(request)
         except Exception as e:
-            print(f"Error en middleware: {str(e)}")
+            log.error("Error en middleware", error=str(e))
             return await call_next(request)
 
     def _requires_auth(self, path: str) -> bool:
@@ -30,5 +37,49 @@ class SessionVerificationMiddleware(BaseHTTPMiddleware):
         ]
         return not any(path.startswith(p) for p in public_paths)
 
+class MetricsMiddleware:
+    """Middleware ASGI puro que mide latencia y peticiones en curso por ruta.
+
+    La latencia se mide hasta el último byte del cuerpo, así que en los
+    streams incluye toda la transferencia. Se etiqueta con la plantilla de la
+    ruta (`/tidal/track/{track_id}`) para no crear una serie por URL.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = self._route_template(scope)
+        status_code = 500
+        started_at = time.perf_counter()
+        http_in_flight.inc(method, route)
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_in_flight.dec(method, route)
+            http_request_duration.observe(time.perf_counter() - started_at, method, route)
+            http_requests.inc(method, route, status_code)
+
+    def _route_template(self, scope: Scope) -> str:
+        app = scope.get("app")
+        router = getattr(app, "router", None)
+        for route in getattr(router, "routes", ()):
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return getattr(route, "path", scope["path"])
+        return "unmatched"
+
 # Crear instancia del middleware
 verify_session_middleware = SessionVerificationMiddleware 
\ No newline at end of file
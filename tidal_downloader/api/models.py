@@ -1,4 +1,5 @@
 from enum import Enum
+from typing import List, Optional
 from pydantic import BaseModel
 
 class OutputFormat(str, Enum):
@@ -7,6 +8,15 @@ class OutputFormat(str, Enum):
     m4a = "m4a"
     wav = "wav"
 
+class StreamCodec(str, Enum):
+    aac = "aac"
+    opus = "opus"
+
+class JobKind(str, Enum):
+    track = "track"
+    album = "album"
+    playlist = "playlist"
+
 class VerificationUri(BaseModel):
     verification_uri: str | None = None
     verification_url: str | None = None
@@ -16,4 +26,13 @@ class VerificationUri(BaseModel):
             return self.verification_uri
         if self.verification_url:
             return self.verification_url
-        raise ValueError("No se proporcionó ni verification_uri ni verification_url") 
\ No newline at end of file
+        raise ValueError("No se proporcionó ni verification_uri ni verification_url")
+
+class TrackIds(BaseModel):
+    ids: List[str]
+
+class JobRequest(BaseModel):
+    type: JobKind
+    id: str
+    output_dir: Optional[str] = None
+    format: OutputFormat = OutputFormat.flac
@@ -0,0 +1,214 @@
+import asyncio
+import os
+import re
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .audio_cache import AudioCache, audio_cache, audio_cache_key
+from .cache import SingleFlight, TTLCache
+from .http_client import get_http_client
+from .log import get_logger
+from .metrics import cdn_bytes
+from .tidal_service import TidalService, tidal_service
+
+# Precarga de las siguientes pistas de una playlist, mix o álbum
+PREFETCH_TRACKS = int(os.getenv("PREFETCH_TRACKS", 2))
+PREFETCH_BYTES = int(os.getenv("PREFETCH_BYTES", 384 * 1024))
+# Ancho de banda total dedicado a precargas (bytes por segundo) y ráfaga permitida
+PREFETCH_BANDWIDTH = int(os.getenv("PREFETCH_BANDWIDTH", 2 * 1024 * 1024))
+PREFETCH_BURST = int(os.getenv("PREFETCH_BURST", PREFETCH_BYTES))
+PREFETCH_CONCURRENCY = int(os.getenv("PREFETCH_CONCURRENCY", 2))
+# Listas de pistas de cada contexto, para no recorrer la playlist en cada pista
+PREFETCH_CONTEXT_TTL = int(os.getenv("PREFETCH_CONTEXT_TTL", 600))
+PREFETCH_CHUNK_SIZE = 32 * 1024
+
+log = get_logger("prefetch")
+
+CONTEXT_PATTERN = re.compile(r"^(playlist|mix|album):([\w-]+)$")
+
+
+def parse_context(context: str) -> Optional[Tuple[str, str]]:
+    """`playlist:<id>`, `mix:<id>` o `album:<id>` como (tipo, id); None si no es válido"""
+    match = CONTEXT_PATTERN.match(context.strip())
+    return (match.group(1), match.group(2)) if match else None
+
+
+class TokenBucket:
+    """Limitador de ancho de banda: `rate` bytes por segundo con ráfagas de hasta `capacity`"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.throttled_time = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def consume(self, amount: int):
+        """Esperar hasta poder gastar `amount` bytes del presupuesto"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        # Un consumidor a la vez: los demás esperan su turno en orden
+        async with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            self.tokens -= amount
+            if self.tokens < 0:
+                delay = -self.tokens / self.rate
+                self.throttled_time += delay
+                await asyncio.sleep(delay)
+
+
+class Prefetcher:
+    """Precarga en segundo plano las pistas que siguen a la actual en su contexto.
+
+    Resuelve los manifiestos de las `tracks` siguientes (quedan en la caché
+    de manifiestos) y guarda sus primeros `prefetch_bytes` en la caché de
+    audio, de modo que saltar a la siguiente pista empiece desde disco.
+    """
+
+    def __init__(self, service: TidalService, cache: AudioCache, tracks: int, prefetch_bytes: int, bucket: TokenBucket, concurrency: int):
+        self.service = service
+        self.cache = cache
+        self.tracks = tracks
+        self.prefetch_bytes = prefetch_bytes
+        self.bucket = bucket
+        self.concurrency = concurrency
+        self.context_tracks = TTLCache(256, PREFETCH_CONTEXT_TTL)
+        self._context_flights = SingleFlight()
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._tasks: Set[asyncio.Task] = set()
+        # Pistas con una precarga en curso
+        self._pending: Set[str] = set()
+
+        # Métricas
+        self.hints = 0
+        self.invalid_hints = 0
+        self.manifests_resolved = 0
+        self.tracks_prefetched = 0
+        self.already_cached = 0
+        self.bytes_prefetched = 0
+        self.errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.tracks > 0
+
+    def hint(self, context: str, track_id: str):
+        """Se está reproduciendo `track_id` dentro de `context`: precargar las siguientes"""
+        if not self.enabled:
+            return
+        parsed = parse_context(context)
+        if parsed is None:
+            self.invalid_hints += 1
+            return
+        self.hints += 1
+        task = asyncio.create_task(self._prefetch_next(parsed, str(track_id)))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _track_ids(self, context: Tuple[str, str]) -> List[str]:
+        track_ids = self.context_tracks.get(context)
+        if track_ids is not None:
+            return track_ids
+
+        async def fetch():
+            _, tracks = await self.service.get_collection_tracks(*context)
+            ids = [str(track.id) for track in tracks]
+            self.context_tracks.set(context, ids)
+            return ids
+
+        # Varias pistas del mismo contexto comparten una sola consulta
+        return await self._context_flights.do(context, fetch)
+
+    async def _prefetch_next(self, context: Tuple[str, str], track_id: str):
+        try:
+            track_ids = await self._track_ids(context)
+        except Exception as e:
+            self.errors += 1
+            log.warning("Error al obtener las pistas del contexto", context=f"{context[0]}:{context[1]}", error=str(e))
+            return
+        if track_id not in track_ids:
+            return
+        position = track_ids.index(track_id)
+        upcoming = [next_id for next_id in dict.fromkeys(track_ids[position + 1:position + 1 + self.tracks]) if next_id not in self._pending]
+        # Se marcan antes de ceder el control para que otra pista no las precargue a la vez
+        self._pending.update(upcoming)
+        await asyncio.gather(*(self._prefetch_track(next_id) for next_id in upcoming))
+
+    async def _prefetch_track(self, track_id: str):
+        """Precargar una pista ya marcada en `_pending` por quien la encoló"""
+        try:
+            if self._slots is None:
+                self._slots = asyncio.Semaphore(self.concurrency)
+            async with self._slots:
+                manifest = await self.service.get_stream_manifest(track_id)
+                if not manifest:
+                    return
+                self.manifests_resolved += 1
+                await self._prefetch_audio(audio_cache_key(track_id, manifest.quality), manifest.url)
+        except Exception as e:
+            self.errors += 1
+            log.warning("Error al precargar la pista", track_id=track_id, error=str(e))
+        finally:
+            self._pending.discard(track_id)
+
+    async def _prefetch_audio(self, cache_key: str, url: str):
+        """Guardar en la caché de audio los primeros `prefetch_bytes` de la pista"""
+        if not self.cache.enabled:
+            return
+        entry = self.cache.lookup(cache_key)
+        start = entry.size if entry is not None else 0
+        if start >= self.prefetch_bytes or (entry is not None and entry.complete):
+            self.already_cached += 1
+            return
+
+        headers = {"Accept-Encoding": "identity", "Range": f"bytes={start}-{self.prefetch_bytes - 1}"}
+        async with get_http_client().get(url, headers=headers) as response:
+            if response.status != 206:
+                return
+            total = response.headers.get("Content-Range", "").rpartition("/")[2]
+            total = int(total) if total.isdigit() else None
+            writer = await self.cache.open_writer(cache_key, start, total, response.headers.get("Content-Type"))
+            if writer is None:
+                return
+            try:
+                async for chunk in response.content.iter_chunked(PREFETCH_CHUNK_SIZE):
+                    await self.bucket.consume(len(chunk))
+                    await writer.write(chunk)
+                    if writer.closed:
+                        return
+                    self.bytes_prefetched += len(chunk)
+                    self.cache.bytes_from_cdn += len(chunk)
+                    cdn_bytes.inc("prefetch", amount=len(chunk))
+            finally:
+                await writer.close()
+        self.tracks_prefetched += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "tracks_ahead": self.tracks,
+            "prefetch_bytes": self.prefetch_bytes,
+            "bandwidth": self.bucket.rate,
+            "hints": self.hints,
+            "invalid_hints": self.invalid_hints,
+            "in_progress": len(self._pending),
+            "manifests_resolved": self.manifests_resolved,
+            "tracks_prefetched": self.tracks_prefetched,
+            "already_cached": self.already_cached,
+            "bytes_prefetched": self.bytes_prefetched,
+            "throttled_seconds": round(self.bucket.throttled_time, 3),
+            "errors": self.errors,
+        }
+
+
+prefetcher = Prefetcher(
+    tidal_service,
+    audio_cache,
+    PREFETCH_TRACKS,
+    PREFETCH_BYTES,
+    TokenBucket(PREFETCH_BANDWIDTH, PREFETCH_BURST),
+    PREFETCH_CONCURRENCY,
+)
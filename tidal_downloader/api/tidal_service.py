@@ -1,18 +1,32 @@
 from tidalapi import Session, Config, Quality, Track, Album
+from tidalapi.media import Stream
+from tidalapi.exceptions import MetadataNotAvailable
 import os
-from typing import Optional, Dict, Any, List, Set
+from typing import Optional, Dict, Any, List, Set, Tuple, Callable, Awaitable, AsyncIterator
 import aiofiles
 import asyncio
 from pathlib import Path
-import aiohttp
+import uuid
 from .models import OutputFormat
+from .executor import run_blocking
+from .http_client import get_http_client
+from .transcoding import Transcoder
+from .metrics import upstream_calls, upstream_call_duration, cdn_bytes, method_name
+from .log import get_logger
+from .cache import TTLCache, ResponseCache, CacheEntry, SingleFlight, ExpiryScheduler, create_cache_backend
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit, parse_qsl
+import re
+import time
 import json
 from datetime import datetime, timedelta
 from fastapi import FastAPI, HTTPException, status, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse, JSONResponse, RedirectResponse
+from fastapi.responses import StreamingResponse, JSONResponse, RedirectResponse, Response
 from dotenv import load_dotenv
 import gzip
+import hashlib
+import inspect
 from functools import lru_cache
 import unicodedata
 # Cargar variables de entorno
@@ -29,9 +43,41 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Loggers por área; las líneas por elemento de un listado se muestrean (LOG_SAMPLE_RATE)
+session_log = get_logger("session")
+login_log = get_logger("login")
+cache_log = get_logger("cache")
+stream_log = get_logger("stream")
+download_log = get_logger("download")
+search_log = get_logger("search")
+catalog_log = get_logger("catalog")
+
+# Configuración de descargas: memoria máxima que se acumula por descarga antes de escribir a disco
+DOWNLOAD_BUFFER_SIZE = int(os.getenv("DOWNLOAD_BUFFER_SIZE", 1024 * 1024))
+DOWNLOAD_CHUNK_SIZE = min(64 * 1024, DOWNLOAD_BUFFER_SIZE)
+
+# Listados largos (playlists, mixes, álbumes): pistas pedidas a Tidal por página
+LISTING_PAGE_SIZE = int(os.getenv("LISTING_PAGE_SIZE", 100))
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
 # Configuración de caché
 CACHE_EXPIRATION = timedelta(minutes=30)
-response_cache: Dict[str, Dict[str, Any]] = {}
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 20000))
+response_cache = ResponseCache(RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_MAX_ENTRIES)
+# Parámetro que cache_response añade a los endpoints para recibir la Request
+CACHE_REQUEST_PARAM = "cache_request"
+# Cálculos en curso por clave de caché (single-flight)
+response_flights = SingleFlight()
+
+# Backend persistente opcional detrás de la caché en memoria ("memory" o "sqlite")
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", "data/response_cache.sqlite3")
+RESPONSE_CACHE_DISK_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_DISK_MAX_BYTES", 512 * 1024 * 1024))
+response_cache_backend = create_cache_backend(RESPONSE_CACHE_BACKEND, RESPONSE_CACHE_PATH, RESPONSE_CACHE_DISK_MAX_BYTES)
+RESPONSE_CACHE_BACKEND_PURGE_INTERVAL = float(os.getenv("RESPONSE_CACHE_BACKEND_PURGE_INTERVAL", 300))
+# Segundos mínimos entre dos purgas de la caché en memoria (agrupa caducidades cercanas)
+CACHE_EXPIRY_RESOLUTION = float(os.getenv("CACHE_EXPIRY_RESOLUTION", 1))
 
 def get_cache_key(endpoint: str, params: Dict[str, Any]) -> str:
     """Genera una clave única para el caché basada en el endpoint y los parámetros."""
@@ -45,53 +91,283 @@ def decompress_response(compressed_data: bytes) -> Dict[str, Any]:
     """Descomprime una respuesta usando gzip."""
     return json.loads(gzip.decompress(compressed_data).decode())
 
+def compute_etag(body: bytes) -> str:
+    """ETag fuerte a partir del JSON sin comprimir."""
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Comparar If-None-Match con el ETag (comparación débil, RFC 9110)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.strip('"')
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        candidate = candidate.strip('"')
+        # La variante gzip comparte el mismo hash con sufijo
+        if candidate == opaque or candidate == f"{opaque}-gzip":
+            return True
+    return False
+
+# Tamaños de portada que sirve resources.tidal.com
+COVER_SIZES = [80, 160, 320, 640, 1280]
+COVER_URL_TEMPLATE = "https://resources.tidal.com/images/{path}/{size}x{size}.jpg"
+
+def track_output_path(output_path: str, format: Any) -> str:
+    """Ruta final de una descarga: `output_path` con la extensión del formato"""
+    # OutputFormat es un Enum de str: en un f-string daría "OutputFormat.mp3" y no "mp3"
+    return str(Path(output_path).with_suffix(f".{OutputFormat(format).value}"))
+
+def build_cover_url(cover_uuid: str, size: int = 1280) -> str:
+    """Construye la URL de una portada a partir de su UUID, igual que Album.image()."""
+    return COVER_URL_TEMPLATE.format(path=cover_uuid.replace("-", "/"), size=size)
+
+# Calidades de streaming en orden descendente
+STREAM_QUALITIES = [
+    Quality.hi_res_lossless,
+    Quality.high_lossless,
+    Quality.low_320k,
+    Quality.low_96k
+]
+# Etiqueta de media_metadata_tags -> mejor calidad disponible
+QUALITY_TAGS = [
+    ("HIRES_LOSSLESS", Quality.hi_res_lossless),
+    ("LOSSLESS", Quality.high_lossless),
+    ("MQA", Quality.high_lossless),
+]
+BEST_QUALITY_CACHE_SIZE = int(os.getenv("BEST_QUALITY_CACHE_SIZE", 50000))
+BEST_QUALITY_TTL = 24 * 3600
+
+def _parse_quality(value: Any) -> Optional[Quality]:
+    try:
+        return Quality(value) if value else None
+    except ValueError:
+        return None
+
+# Caché de manifiestos de streaming por (track_id, calidad)
+STREAM_MANIFEST_CACHE_SIZE = int(os.getenv("STREAM_MANIFEST_CACHE_SIZE", 2048))
+STREAM_MANIFEST_DEFAULT_TTL = float(os.getenv("STREAM_MANIFEST_DEFAULT_TTL", 600))
+STREAM_MANIFEST_MAX_TTL = float(os.getenv("STREAM_MANIFEST_MAX_TTL", 3600))
+# Margen para no entregar una URL firmada a punto de caducar
+STREAM_URL_EXPIRY_MARGIN = 60
+stream_manifest_cache = TTLCache(STREAM_MANIFEST_CACHE_SIZE, STREAM_MANIFEST_DEFAULT_TTL)
+
+# Caché de letras por pista; las pistas sin letra también se recuerdan (caché negativa)
+LYRICS_CACHE_SIZE = int(os.getenv("LYRICS_CACHE_SIZE", 20000))
+LYRICS_TTL = float(os.getenv("LYRICS_TTL", 7 * 24 * 3600))
+LYRICS_NEGATIVE_TTL = float(os.getenv("LYRICS_NEGATIVE_TTL", 24 * 3600))
+lyrics_cache = TTLCache(LYRICS_CACHE_SIZE, LYRICS_TTL)
+lyrics_flights = SingleFlight()
+_LYRICS_MISSING = object()
+
+SIGNED_URL_EXPIRY_PATTERN = re.compile(r"(?:^|~)exp=(\d{9,11})|^(\d{9,11})~")
+
+@dataclass
+class ResolvedStream:
+    """Manifiesto de streaming resuelto para una pista y calidad"""
+    track_id: str
+    quality: Any
+    urls: List[str]
+    codec: Optional[str] = None
+    mime_type: Optional[str] = None
+    encryption_key: Optional[str] = None
+    resolved_at: float = field(default_factory=time.time)
+
+    @property
+    def url(self) -> str:
+        """URL preferida: la primera en FLAC o, si no hay, la primera disponible"""
+        for url in self.urls:
+            if url.endswith('.flac'):
+                return url
+        return self.urls[0]
+
+def signed_url_expiry(url: str) -> Optional[float]:
+    """Obtener el instante de caducidad (epoch) de una URL firmada del CDN, si lo indica."""
+    for name, value in parse_qsl(urlsplit(url).query):
+        if name.lower() == "expires" and value.isdigit():
+            return float(value)
+        match = SIGNED_URL_EXPIRY_PATTERN.search(value)
+        if match:
+            return float(match.group(1) or match.group(2))
+    return None
+
+def manifest_ttl(urls: List[str]) -> float:
+    """TTL de caché de un manifiesto según la URL firmada que caduque antes"""
+    expiries = [expiry for expiry in (signed_url_expiry(url) for url in urls) if expiry]
+    if not expiries:
+        return STREAM_MANIFEST_DEFAULT_TTL
+    return min(min(expiries) - time.time() - STREAM_URL_EXPIRY_MARGIN, STREAM_MANIFEST_MAX_TTL)
+
 def _normalize(text: str) -> str:
     return unicodedata.normalize("NFKD", text).encode("ASCII", "ignore").decode().lower()
 
 from functools import wraps
 
-def cache_response(expiration: timedelta = CACHE_EXPIRATION):
+async def get_cached_entry(cache_key: str, endpoint: str) -> Optional[CacheEntry]:
+    """Buscar una respuesta en memoria y, si no está, en el backend persistente."""
+    entry = response_cache.get(cache_key, endpoint)
+    if entry is None and response_cache_backend is not None:
+        try:
+            entry = await run_blocking("cache", response_cache_backend.get, cache_key)
+        except Exception as e:
+            cache_log.warning("Error al leer la caché persistente", error=str(e))
+            return None
+        if entry is not None:
+            # Subir la entrada al nivel en memoria
+            response_cache.set(cache_key, entry)
+    return entry
+
+async def store_cached_entry(cache_key: str, entry: CacheEntry):
+    """Guardar una respuesta en memoria y en el backend persistente."""
+    response_cache.set(cache_key, entry)
+    if response_cache_backend is not None:
+        try:
+            await run_blocking("cache", response_cache_backend.set, cache_key, entry)
+        except Exception as e:
+            cache_log.warning("Error al escribir la caché persistente", error=str(e))
+
+# Tareas en segundo plano (revalidaciones, precarga de letras) para que no se recolecten a medias
+_revalidation_tasks: Set["asyncio.Task[Any]"] = set()
+
+def _revalidate_in_background(cache_key: str, endpoint: str, compute):
+    """Refrescar una entrada obsoleta sin hacer esperar al cliente"""
+    if cache_key in response_flights:
+        return
+    response_cache.record_revalidation(endpoint)
+
+    async def refresh():
+        try:
+            await response_flights.do(cache_key, compute)
+        except Exception as e:
+            cache_log.warning("Error al revalidar", endpoint=endpoint, error=str(e))
+
+    task = asyncio.ensure_future(refresh())
+    _revalidation_tasks.add(task)
+    task.add_done_callback(_revalidation_tasks.discard)
+
+def cache_response(expiration: timedelta = CACHE_EXPIRATION, stale_while_revalidate: Optional[timedelta] = None, private: bool = False):
+    """Cachear la respuesta JSON de un endpoint.
+
+    El endpoint responde con ETag y Cache-Control acordes al TTL, contesta
+    304 a un If-None-Match que coincida y, en los aciertos, envía el JSON
+    guardado sin volver a serializarlo (comprimido si el cliente acepta gzip).
+
+    Args:
+        expiration: Tiempo durante el que la respuesta se considera fresca.
+        stale_while_revalidate: Si se indica, tras `expiration` la respuesta
+            obsoleta se sigue sirviendo durante este tiempo mientras una única
+            tarea en segundo plano la refresca.
+        private: Para datos de la cuenta (playlists del usuario, favoritos):
+            `Cache-Control: private` para que ningún proxy o CDN compartido
+            los guarde y se los sirva a otro usuario.
+    """
+    stale_window = stale_while_revalidate.total_seconds() if stale_while_revalidate else 0
+
     def decorator(func):
-        @wraps(func)
-        async def wrapper(*args, **kwargs):
+        signature = inspect.signature(func)
+        request_param = next(
+            (name for name, param in signature.parameters.items() if param.annotation is Request),
+            None
+        )
+
+        async def cached_entry(*args, **kwargs) -> CacheEntry:
+            """Obtener la entrada de caché del endpoint, calculándola si hace falta"""
             # Clave de caché
-            params = {k: v for k, v in kwargs.items() if k != 'request'}
+            params = {k: v for k, v in kwargs.items() if k != 'request' and k != request_param}
             cache_key = get_cache_key(func.__name__, params)
 
+            async def compute():
+                # Ejecutar función original
+                response = await func(*args, **kwargs)
+
+                # Guardar respuesta
+                body = json.dumps(response).encode()
+                fresh_until = time.time() + expiration.total_seconds()
+                entry = CacheEntry(
+                    endpoint=func.__name__,
+                    data=gzip.compress(body),
+                    expires_at=fresh_until + stale_window,
+                    fresh_until=fresh_until,
+                    etag=compute_etag(body)
+                )
+                await store_cached_entry(cache_key, entry)
+                return entry
+
             # Revisar caché
-            if cache_key in response_cache:
-                cache_entry = response_cache[cache_key]
-                if datetime.now() < cache_entry['expires_at']:
-                    return decompress_response(cache_entry['data'])
-
-            # Ejecutar función original
-            response = await func(*args, **kwargs)
-
-            # Guardar respuesta
-            response_cache[cache_key] = {
-                'data': compress_response(response),
-                'expires_at': datetime.now() + expiration
-            }
+            cache_entry = await get_cached_entry(cache_key, func.__name__)
+            if cache_entry:
+                if not cache_entry.is_fresh():
+                    _revalidate_in_background(cache_key, func.__name__, compute)
+                return cache_entry
+
+            # Las peticiones idénticas concurrentes esperan al mismo cálculo
+            if cache_key in response_flights:
+                response_cache.record_coalesced(func.__name__)
+            return await response_flights.do(cache_key, compute)
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            # La Request solo se inyecta para leer las cabeceras condicionales
+            if request_param:
+                request = kwargs.get(request_param)
+                # Las variantes en streaming no se cachean
+                if request is not None and NDJSON_MEDIA_TYPE in request.headers.get("accept", ""):
+                    return await func(*args, **kwargs)
+            else:
+                request = kwargs.pop(CACHE_REQUEST_PARAM, None)
+
+            cache_entry = await cached_entry(*args, **kwargs)
+            return _cached_json_response(cache_entry, request, stale_window, private)
 
-            return response
+        # Acceso a la misma caché desde otros endpoints (p. ej. consultas en lote)
+        wrapper.cached_entry = cached_entry
+
+        if not request_param:
+            wrapper.__signature__ = signature.replace(parameters=[
+                *signature.parameters.values(),
+                inspect.Parameter(CACHE_REQUEST_PARAM, inspect.Parameter.KEYWORD_ONLY, annotation=Request)
+            ])
         return wrapper
     return decorator
 
+def _cached_json_response(entry: CacheEntry, request: Optional[Request], stale_window: float, private: bool = False) -> Response:
+    """Respuesta HTTP para una entrada de caché, con validadores y 304 si procede"""
+    if entry.etag is None:
+        # Entradas antiguas del backend persistente sin ETag guardado
+        entry.etag = compute_etag(gzip.decompress(entry.data))
+
+    fresh_until = entry.expires_at if entry.fresh_until is None else entry.fresh_until
+    scope = "private" if private else "public"
+    cache_control = f"{scope}, max-age={max(0, int(fresh_until - time.time()))}"
+    if stale_window:
+        cache_control += f", stale-while-revalidate={int(stale_window)}"
 
-async def cleanup_expired_cache():
-    """Limpia las entradas expiradas del caché."""
-    while True:
-        now = datetime.now()
-        expired_keys = [
-            key for key, entry in response_cache.items()
-            if now >= entry['expires_at']
-        ]
-        for key in expired_keys:
-            del response_cache[key]
-        await asyncio.sleep(300)  # Limpiar cada 5 minutos
+    accepts_gzip = request is not None and "gzip" in request.headers.get("accept-encoding", "")
+    etag = f'{entry.etag[:-1]}-gzip"' if accepts_gzip else entry.etag
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
 
-# Iniciar limpieza de caché
-asyncio.create_task(cleanup_expired_cache())
+    if request is not None and etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    if accepts_gzip:
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=entry.data, media_type="application/json", headers=headers)
+    return Response(content=gzip.decompress(entry.data), media_type="application/json", headers=headers)
+
+
+async def purge_backend_cache():
+    """Eliminar las entradas caducadas de la caché persistente"""
+    await run_blocking("cache", response_cache_backend.purge_expired)
+
+# Limpieza de caducados; se arranca y se detiene en el lifespan de la app
+expiry_scheduler = ExpiryScheduler(
+    response_cache,
+    resolution=CACHE_EXPIRY_RESOLUTION,
+    backend_purge=purge_backend_cache if response_cache_backend is not None else None,
+    backend_interval=RESPONSE_CACHE_BACKEND_PURGE_INTERVAL,
+)
 
 class TidalService:
     def __init__(self):
@@ -101,58 +377,72 @@ class TidalService:
         self.link_login = None
         self.config_file = Path(os.path.expanduser("~")) / ".tidal_session.json"
         self.login_cache_file = Path(os.path.expanduser("~")) / ".tidal_login_cache.json"
+        # Mejor calidad conocida por pista, para pedir directamente ese nivel
+        self.best_quality = TTLCache(BEST_QUALITY_CACHE_SIZE, BEST_QUALITY_TTL)
         # Limpiar caché al iniciar
         self.clear_login_cache()
         # Inicializar sesión
         self.initialize_session()
         
+    async def run(self, func, *args, pool: str = "metadata", **kwargs):
+        """Ejecutar una llamada bloqueante de tidalapi en un pool de hilos"""
+        method = method_name(func)
+        started_at = time.perf_counter()
+        outcome = "error"
+        try:
+            result = await run_blocking(pool, func, *args, **kwargs)
+            outcome = "ok"
+            return result
+        finally:
+            upstream_calls.inc(method, outcome)
+            upstream_call_duration.observe(time.perf_counter() - started_at, method)
+
     def initialize_session(self):
         """Inicializar la sesión de Tidal"""
         try:
-            print("[INIT] Inicializando sesión de Tidal")
+            session_log.info("Inicializando sesión de Tidal")
             # Limpiar sesión actual
             self.session = Session()
             
             # Intentar cargar sesión guardada
             if self.load_session():
-                print("[INIT] Sesión cargada exitosamente")
+                session_log.info("Sesión cargada")
                 return True
                 
-            print("[INIT] No se pudo cargar sesión existente")
+            session_log.info("No hay una sesión guardada válida")
             return False
         except Exception as e:
-            print(f"[INIT] Error al inicializar sesión: {str(e)}")
+            session_log.error("Error al inicializar la sesión", error=str(e))
             return False
 
     def clear_login_cache(self):
         """Limpiar el caché de login"""
         try:
-            print("[CACHE] Limpiando caché de login al iniciar")
+            login_log.debug("Limpiando caché de login")
             if self.login_cache_file.exists():
                 os.remove(self.login_cache_file)
-                print("[CACHE] Caché de login eliminado")
+                login_log.debug("Caché de login eliminado")
         except Exception as e:
-            print(f"[CACHE] Error al limpiar caché de login: {str(e)}")
+            login_log.warning("Error al limpiar caché de login", error=str(e))
         
     def load_session(self):
         """Cargar la sesión guardada si existe"""
         try:
-            print(f"[SESSION] Intentando cargar sesión desde: {self.config_file}")
+            session_log.debug("Cargando sesión", path=str(self.config_file))
             if not self.config_file.exists():
-                print("[SESSION] No se encontró archivo de sesión")
+                session_log.info("No se encontró archivo de sesión", path=str(self.config_file))
                 return False
             
-            print("[SESSION] Archivo de sesión encontrado")
             with open(self.config_file, 'r') as f:
                 session_data = json.load(f)
-            print(f"[SESSION] Datos de sesión cargados: {list(session_data.keys())}")
+            session_log.debug("Datos de sesión cargados", keys=",".join(session_data.keys()))
             
             if not all(key in session_data for key in ['access_token', 'refresh_token', 'token_type']):
-                print("[SESSION] Datos de sesión incompletos")
+                session_log.warning("Datos de sesión incompletos")
                 return False
             
             try:
-                print("[SESSION] Intentando cargar sesión OAuth")
+                session_log.debug("Cargando sesión OAuth")
                 self.session.load_oauth_session(
                     session_data['access_token'],
                     session_data['refresh_token'],
@@ -161,26 +451,26 @@ class TidalService:
                 
                 # Verificar si la sesión es válida
                 if self.session.check_login():
-                    print("[SESSION] Sesión cargada exitosamente")
+                    session_log.info("Sesión OAuth válida")
                     return True
                 else:
-                    print("[SESSION] Sesión expirada, intentando refrescar")
+                    session_log.info("Sesión expirada, refrescando")
                     try:
                         self.session.refresh_access_token()
                         if self.session.check_login():
-                            print("[SESSION] Sesión refrescada exitosamente")
+                            session_log.info("Sesión refrescada")
                             self.save_session()
                             return True
                     except Exception as e:
-                        print(f"[SESSION] Error al refrescar la sesión: {str(e)}")
+                        session_log.warning("Error al refrescar la sesión", error=str(e))
                     self.clear_session()
             except Exception as e:
-                print(f"[SESSION] Error al cargar la sesión OAuth: {str(e)}")
+                session_log.warning("Error al cargar la sesión OAuth", error=str(e))
                 self.clear_session()
             
             return False
         except Exception as e:
-            print(f"[SESSION] Error general al cargar la sesión: {str(e)}")
+            session_log.error("Error al cargar la sesión", error=str(e))
             return False
 
     def load_login_cache(self) -> Optional[Dict[str, Any]]:
@@ -194,7 +484,7 @@ class TidalService:
                         return cache_data
             return None
         except Exception as e:
-            print(f"[CACHE] Error al cargar caché de login: {str(e)}")
+            login_log.warning("Error al cargar caché de login", error=str(e))
             return None
 
     def save_login_cache(self, login_data: Dict[str, Any]):
@@ -207,17 +497,16 @@ class TidalService:
             }
             with open(self.login_cache_file, 'w') as f:
                 json.dump(cache_data, f, indent=4)
-            print("[CACHE] Caché de login guardado exitosamente")
+            login_log.debug("Caché de login guardado")
         except Exception as e:
-            print(f"[CACHE] Error al guardar caché de login: {str(e)}")
+            login_log.warning("Error al guardar caché de login", error=str(e))
 
     def clear_session(self):
         """Limpiar la sesión actual y el archivo de sesión"""
         try:
-            print("[SESSION] Iniciando limpieza de sesión")
+            session_log.info("Limpiando sesión")
             # Primero limpiamos la sesión actual
             self.session = Session()
-            print("[SESSION] Sesión actual limpiada")
             
             # Limpiar caché de login
             self.clear_login_cache()
@@ -225,43 +514,40 @@ class TidalService:
             # Intentamos eliminar el archivo de sesión
             try:
                 if self.config_file.exists():
-                    print(f"[SESSION] Intentando eliminar archivo: {self.config_file}")
+                    session_log.debug("Eliminando archivo de sesión", path=str(self.config_file))
                     os.remove(self.config_file)
-                    print("[SESSION] Archivo eliminado exitosamente")
             except PermissionError:
-                print("[SESSION] Error de permisos al eliminar archivo, intentando sobrescribir")
+                session_log.warning("Sin permisos para eliminar el archivo de sesión, se sobrescribe", path=str(self.config_file))
                 # Si el archivo está en uso, intentamos sobrescribirlo con una sesión vacía
                 try:
                     with open(self.config_file, 'w') as f:
                         json.dump({}, f, indent=4)
-                    print("[SESSION] Archivo sobrescrito exitosamente")
                 except Exception as e:
-                    print(f"[SESSION] Error al sobrescribir archivo: {str(e)}")
+                    session_log.error("Error al sobrescribir el archivo de sesión", error=str(e))
             except Exception as e:
-                print(f"[SESSION] Error al eliminar archivo: {str(e)}")
+                session_log.error("Error al eliminar el archivo de sesión", error=str(e))
                 
-            print("[SESSION] Limpieza de sesión completada")
         except Exception as e:
-            print(f"[SESSION] Error general al limpiar sesión: {str(e)}")
+            session_log.error("Error al limpiar la sesión", error=str(e))
         
     def save_session(self):
         """Guardar los datos de la sesión actual"""
         try:
-            print("[SESSION] Intentando guardar sesión")
+            session_log.debug("Guardando sesión")
             
             # Verificar si hay una sesión activa
             if not self.session.check_login():
-                print("[SESSION] No hay una sesión activa para guardar")
+                session_log.warning("No hay una sesión activa para guardar")
                 return False
 
             # Verificar que los tokens existan y no estén vacíos
             required_tokens = ['access_token', 'refresh_token', 'token_type']
             for token in required_tokens:
                 if not hasattr(self.session, token):
-                    print(f"[SESSION] Falta token: {token}")
+                    session_log.warning("Falta token en la sesión", token=token)
                     return False
                 if not getattr(self.session, token):
-                    print(f"[SESSION] Token vacío: {token}")
+                    session_log.warning("Token vacío en la sesión", token=token)
                     return False
 
             # Obtener los tokens
@@ -272,8 +558,6 @@ class TidalService:
                 'last_updated': str(datetime.now())
             }
             
-            print(f"[SESSION] Tokens obtenidos: {list(session_data.keys())}")
-            
             # Asegurarse de que el directorio existe
             self.config_file.parent.mkdir(parents=True, exist_ok=True)
             
@@ -281,10 +565,10 @@ class TidalService:
             try:
                 with open(self.config_file, 'w') as f:
                     json.dump(session_data, f, indent=4)
-                print("[SESSION] Sesión guardada exitosamente en:", self.config_file)
+                session_log.info("Sesión guardada", path=str(self.config_file))
                 return True
             except Exception as e:
-                print(f"[SESSION] Error al guardar directamente: {str(e)}")
+                session_log.warning("Error al guardar la sesión, se reintenta con un archivo temporal", error=str(e))
                 
                 # Si falla, intentar con un archivo temporal con nombre único
                 try:
@@ -298,25 +582,25 @@ class TidalService:
                         if self.config_file.exists():
                             os.remove(self.config_file)
                         os.rename(temp_file, self.config_file)
-                        print("[SESSION] Sesión guardada exitosamente usando archivo temporal")
+                        session_log.info("Sesión guardada con archivo temporal", path=str(self.config_file))
                         return True
                     except Exception as e:
-                        print(f"[SESSION] Error al mover archivo temporal: {str(e)}")
+                        session_log.error("Error al mover el archivo temporal de sesión", error=str(e))
                         if temp_file.exists():
                             os.remove(temp_file)
                         return False
                 except Exception as e:
-                    print(f"[SESSION] Error al usar archivo temporal: {str(e)}")
+                    session_log.error("Error al usar el archivo temporal de sesión", error=str(e))
                     return False
                 
         except Exception as e:
-            print(f"[SESSION] Error al guardar la sesión: {str(e)}")
+            session_log.error("Error al guardar la sesión", error=str(e))
             return False
 
     async def get_playlist_info(self, playlist_id: str) -> Optional[Dict[str, Any]]:
         """Obtener información de una playlist"""
         try:
-            playlist = self.session.playlist(playlist_id)
+            playlist = await self.run(self.session.playlist, playlist_id)
             
             # Obtener la portada de la playlist
             cover_url = None
@@ -340,36 +624,113 @@ class TidalService:
                 "cover_url": cover_url
             }
         except Exception as e:
-            print(f"Error al obtener información de la playlist: {str(e)}")
+            catalog_log.warning("Error al obtener información de la playlist", playlist_id=playlist_id, error=str(e))
             return None
 
     async def get_playlist_tracks(self, playlist_id: str) -> List[Dict[str, Any]]:
         """Obtener todas las pistas de una playlist"""
         try:
-            playlist = self.session.playlist(playlist_id)
+            playlist = await self.run(self.session.playlist, playlist_id)
             tracks = []
-            for track in playlist.tracks():
-                # Obtener la portada del álbum
-                cover_url = await self.get_album_cover_url(track, size=1280)
-                
-                tracks.append({
-                    "id": track.id,
-                    "name": track.name,
-                    "artist": track.artist.name,
-                    "album": track.album.name,
-                    "duration": track.duration,
-                    "cover_url": cover_url
-                })
+            for track in await self.run(playlist.tracks):
+                self.remember_quality(track)
+                tracks.append(await self._listing_track_info(track))
             return tracks
         except Exception as e:
-            print(f"Error al obtener pistas de la playlist: {str(e)}")
+            catalog_log.warning("Error al obtener pistas de la playlist", playlist_id=playlist_id, error=str(e))
             return []
 
+    async def get_playlist_track_pages(self, playlist_id: str, offset: int = 0, limit: Optional[int] = None) -> Optional[Tuple[int, AsyncIterator[List[Dict[str, Any]]]]]:
+        """Total de pistas de la playlist y un iterador que las entrega página a página"""
+        try:
+            playlist = await self.run(self.session.playlist, playlist_id)
+        except Exception as e:
+            catalog_log.warning("Error al obtener la playlist", playlist_id=playlist_id, error=str(e))
+            return None
+
+        def fetch_page(size: int, start: int):
+            return playlist.tracks(limit=size, offset=start)
+
+        total = playlist.num_tracks or 0
+        return total, self._listing_pages(fetch_page, self._listing_track_info, offset, limit, total)
+
+    async def _listing_track_info(self, track) -> Dict[str, Any]:
+        """Datos de una pista en los listados de playlists y mixes"""
+        # Obtener la portada del álbum
+        cover_url = await self.get_album_cover_url(track, size=1280)
+        return {
+            "id": track.id,
+            "name": track.name,
+            "artist": track.artist.name,
+            "album": track.album.name,
+            "duration": track.duration,
+            "cover_url": cover_url
+        }
+
+    async def _listing_pages(
+        self,
+        fetch_page: Callable[[int, int], List[Any]],
+        format_track: Callable[[Any], Awaitable[Dict[str, Any]]],
+        offset: int,
+        limit: Optional[int],
+        total: int
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Recorrer un listado pidiendo a Tidal una página cada vez.
+
+        Cada página se formatea y se entrega en cuanto llega, así que en
+        memoria solo hay una página de pistas aunque el listado sea enorme.
+        """
+        end = total if limit is None else min(total, offset + limit)
+        while offset < end:
+            page = await self.run(fetch_page, min(LISTING_PAGE_SIZE, end - offset), offset)
+            if not page:
+                break
+            tracks = []
+            for track in page:
+                try:
+                    self.remember_quality(track)
+                    tracks.append(await format_track(track))
+                except Exception as e:
+                    catalog_log.warning("Error al procesar pista del listado", track_id=getattr(track, 'id', None), error=str(e))
+            offset += len(page)
+            yield tracks
+
+    async def get_collection_tracks(self, kind: str, target_id: str) -> Tuple[Optional[str], List[Track]]:
+        """Nombre y pistas de una pista suelta, un álbum, una playlist o un mix.
+
+        Los álbumes y playlists se recorren por páginas para no depender del
+        límite por defecto de Tidal en listados grandes.
+        """
+        if kind == "track":
+            track = await self.run(self.session.track, target_id)
+            return None, [track]
+        if kind == "mix":
+            mix = await self.run(self.session.mix, target_id)
+            items = await self.run(mix.items)
+            return mix.title, [item for item in items if isinstance(item, Track)]
+
+        if kind == "album":
+            collection = await self.run(self.session.album, target_id)
+        elif kind == "playlist":
+            collection = await self.run(self.session.playlist, target_id)
+        else:
+            raise ValueError(f"Tipo de colección no soportado: {kind}")
+
+        tracks: List[Track] = []
+        total = collection.num_tracks or 0
+        while len(tracks) < total:
+            page = await self.run(collection.tracks, limit=LISTING_PAGE_SIZE, offset=len(tracks))
+            if not page:
+                break
+            tracks.extend(page)
+        return collection.name, tracks
+
     async def download_playlist(self, playlist_id: str, output_dir: str, format: OutputFormat = OutputFormat.flac) -> Dict[str, Any]:
         """Descargar todas las pistas de una playlist"""
         try:
             # Obtener información de la playlist
-            playlist = self.session.playlist(playlist_id)
+            playlist = await self.run(self.session.playlist, playlist_id)
+            playlist_tracks = await self.run(playlist.tracks)
             playlist_dir = Path(output_dir) / playlist.name
             playlist_dir.mkdir(parents=True, exist_ok=True)
 
@@ -379,14 +740,14 @@ class TidalService:
                 "failed": []
             }
 
-            for track in playlist.tracks():
+            for track in playlist_tracks:
                 try:
                     # Crear nombre de archivo seguro
                     safe_name = f"{track.name} - {track.artist.name}".replace("/", "_").replace("\\", "_")
-                    output_path = playlist_dir / f"{safe_name}.{format}"
+                    output_path = str(playlist_dir / f"{safe_name}.{OutputFormat(format).value}")
                     
                     # Descargar la pista
-                    success = await self.download_track(track.id, str(output_path), format)
+                    success = await self.download_track(track.id, output_path, format)
                     
                     if success:
                         results["success"].append({
@@ -402,7 +763,7 @@ class TidalService:
                             "artist": track.artist.name
                         })
                 except Exception as e:
-                    print(f"Error al descargar pista {track.name}: {str(e)}")
+                    download_log.warning("Error al descargar pista", track_id=track.id, error=str(e))
                     results["failed"].append({
                         "id": track.id,
                         "name": track.name,
@@ -412,13 +773,13 @@ class TidalService:
 
             return {
                 "playlist_name": playlist.name,
-                "total_tracks": len(playlist.tracks()),
+                "total_tracks": len(playlist_tracks),
                 "successful_downloads": len(results["success"]),
                 "failed_downloads": len(results["failed"]),
                 "results": results
             }
         except Exception as e:
-            print(f"Error al descargar playlist: {str(e)}")
+            download_log.error("Error al descargar playlist", error=str(e))
             return {
                 "error": str(e),
                 "successful_downloads": 0,
@@ -429,14 +790,14 @@ class TidalService:
     async def get_login_link(self, force_new: bool = False) -> Optional[Dict[str, Any]]:
         try:
             # Primero verificar si hay una sesión activa
-            if self.session.check_login():
+            if await self.run(self.session.check_login):
                 return {"status": "success", "message": "Ya estás autenticado"}
             
             # Verificar si hay un caché de login válido y no se está forzando uno nuevo
             if not force_new:
                 cached_login = self.load_login_cache()
                 if cached_login:
-                    print("[LOGIN] Usando link de login en caché")
+                    login_log.debug("Usando link de login en caché")
                     return {
                         "status": "pending",
                         "verification_uri": cached_login['verification_uri'],
@@ -445,8 +806,8 @@ class TidalService:
                     }
             
             # Si no hay caché o se está forzando uno nuevo, obtener nuevo link de login
-            print("[LOGIN] Generando nuevo link de login")
-            self.link_login = self.session.get_link_login()
+            login_log.info("Generando nuevo link de login")
+            self.link_login = await self.run(self.session.get_link_login)
             
             # Obtener el código de verificación del link
             verification_code = None
@@ -466,39 +827,36 @@ class TidalService:
                 "created_at": datetime.now().isoformat()
             }
             
-            print(f"[LOGIN] Código de verificación: {verification_code}")
-            print(f"[LOGIN] URI completa: {self.link_login.verification_uri_complete}")
-            print(f"[LOGIN] Tiempo de expiración: {expires_in} segundos")
+            login_log.info("Link de login generado", code=verification_code, uri=self.link_login.verification_uri_complete, expires_in=expires_in)
             
             # Guardar en caché
             self.save_login_cache(login_data)
             return login_data
             
         except Exception as e:
-            print(f"[LOGIN] Error al obtener link de login: {str(e)}")
+            login_log.error("Error al obtener link de login", error=str(e))
             return None
 
     async def process_login(self, verification_uri: str) -> bool:
         try:
-            print(f"[LOGIN] Iniciando proceso de login con URI: {verification_uri}")
+            login_log.info("Procesando login", uri=verification_uri)
             
             # Verificar si hay un caché de login válido
             cached_login = self.load_login_cache()
             if not cached_login:
-                print("[LOGIN] No hay caché de login válido")
+                login_log.warning("No hay caché de login válido")
                 return False
             
             # Verificar si el código ha expirado
             created_at = datetime.fromisoformat(cached_login['created_at'])
             if (datetime.now() - created_at).total_seconds() > 300:  # 5 minutos
-                print("[LOGIN] Código de verificación expirado")
+                login_log.warning("Código de verificación expirado")
                 return False
             
             # Procesar el login
             try:
-                print("[LOGIN] Procesando login con Tidal")
                 if not self.link_login:
-                    print("[LOGIN] No hay objeto link_login disponible")
+                    login_log.warning("No hay objeto link_login disponible")
                     return False
                 
                 # Intentar procesar el login con reintentos
@@ -508,29 +866,27 @@ class TidalService:
                 
                 while retry_count < max_retries:
                     try:
-                        print(f"[LOGIN] Intento {retry_count + 1} de {max_retries}")
+                        login_log.debug("Intento de login", attempt=retry_count + 1, max_retries=max_retries)
                         
                         # Verificar si el usuario ha confirmado el login
                         try:
-                            print("[LOGIN] Procesando link_login...")
-                            self.session.process_link_login(self.link_login, until_expiry=False)
-                            print("[LOGIN] Link login procesado exitosamente")
+                            await self.run(self.session.process_link_login, self.link_login, until_expiry=False)
+                            login_log.debug("Link login procesado")
                             
                             # Verificar si el login fue exitoso
-                            if self.session.check_login():
-                                print("[LOGIN] Login verificado exitosamente")
+                            if await self.run(self.session.check_login):
+                                login_log.info("Login verificado")
                                 
                                 # Guardar la sesión
-                                if self.save_session():
-                                    print("[LOGIN] Sesión guardada exitosamente")
+                                if await self.run(self.save_session):
                                     # Limpiar el caché de login
                                     self.clear_login_cache()
                                     return True
                                 else:
-                                    print("[LOGIN] Error al guardar la sesión")
+                                    login_log.error("Error al guardar la sesión tras el login")
                                     return False
                             else:
-                                print("[LOGIN] Login no verificado, esperando confirmación")
+                                login_log.debug("Login no verificado, esperando confirmación")
                                 last_error = "Esperando confirmación del usuario"
                                 retry_count += 1
                                 await asyncio.sleep(2)  # Esperar 2 segundos entre intentos
@@ -538,13 +894,13 @@ class TidalService:
                                 
                         except Exception as e:
                             error_msg = str(e)
-                            print(f"[LOGIN] Error en intento {retry_count + 1}: {error_msg}")
+                            login_log.warning("Error en intento de login", attempt=retry_count + 1, error=error_msg)
                             
                             if "You took too long to log in" in error_msg:
-                                print("[LOGIN] Tiempo de espera agotado")
+                                login_log.warning("Tiempo de espera del login agotado")
                                 return False
                             elif "User code expired" in error_msg:
-                                print("[LOGIN] Código expirado")
+                                login_log.warning("Código de login expirado")
                                 return False
                             else:
                                 last_error = error_msg
@@ -553,27 +909,28 @@ class TidalService:
                                 continue
                                 
                     except Exception as e:
-                        print(f"[LOGIN] Error general en intento {retry_count + 1}: {str(e)}")
+                        login_log.warning("Error en intento de login", attempt=retry_count + 1, error=str(e))
                         last_error = str(e)
                         retry_count += 1
                         await asyncio.sleep(2)
                         continue
                 
-                print(f"[LOGIN] Error después de {max_retries} intentos: {last_error}")
+                login_log.error("Login fallido tras los reintentos", attempts=max_retries, error=last_error)
                 return False
                 
             except Exception as e:
-                print(f"[LOGIN] Error al procesar login con Tidal: {str(e)}")
+                login_log.error("Error al procesar login con Tidal", error=str(e))
                 return False
                 
         except Exception as e:
-            print(f"[LOGIN] Error general al procesar login: {str(e)}")
+            login_log.error("Error al procesar login", error=str(e))
             return False
 
     async def get_track_info(self, track_id: str) -> Optional[Dict[str, Any]]:
         try:
-            print(f"[TRACK] Obteniendo información para track ID: {track_id}")
-            track = self.session.track(track_id)
+            catalog_log.debug("Obteniendo información de la pista", track_id=track_id)
+            track = await self.run(self.session.track, track_id)
+            self.remember_quality(track)
             
             # Obtener la URL de la portada
             cover_url = await self.get_album_cover_url(track)
@@ -589,93 +946,237 @@ class TidalService:
                 "cover_url": cover_url if cover_url else None
             }
             
-            print(f"[TRACK] Información obtenida exitosamente para: {track.name}")
             return track_info
         except Exception as e:
-            print(f"[TRACK] Error al obtener información de la pista: {str(e)}")
+            catalog_log.warning("Error al obtener información de la pista", track_id=track_id, error=str(e))
             return None
 
     async def get_stream_url(self, track_id: str) -> Optional[str]:
+        manifest = await self.get_stream_manifest(track_id)
+        return manifest.url if manifest else None
+
+    async def get_stream_manifest(self, track_id: str, max_quality: Optional[Quality] = None) -> Optional["ResolvedStream"]:
+        """Resolver el manifiesto de streaming de una pista, con caché por (track_id, calidad)
+
+        Args:
+            track_id: ID de la pista
+            max_quality: Calidad máxima aceptada. Por defecto la mejor disponible.
+        """
         try:
-            print(f"[STREAM] Obteniendo URL de streaming para track ID: {track_id}")
-            track = self.session.track(track_id)
+            track_id = str(track_id)
             
-            # Lista de calidades en orden descendente
-            qualities = [
-                Quality.hi_res_lossless,
-                Quality.high_lossless,
-                Quality.low_320k,
-                Quality.low_96k
-            ]
+            # Calidades en orden descendente a partir de la máxima pedida
+            qualities = STREAM_QUALITIES
+            if max_quality is not None and max_quality in STREAM_QUALITIES:
+                qualities = STREAM_QUALITIES[STREAM_QUALITIES.index(max_quality):]
+            
+            # Si ya sabemos la mejor calidad de la pista, no probar niveles superiores
+            best = self.best_quality.get(track_id)
+            if best in qualities:
+                qualities = qualities[qualities.index(best):]
+            
+            # Un manifiesto resuelto hace poco evita la ida y vuelta a Tidal
+            cached = stream_manifest_cache.get((track_id, qualities[0]))
+            if cached:
+                return cached
+            
+            stream_log.debug("Resolviendo manifiesto", track_id=track_id)
             
             # Probar cada calidad
             for quality in qualities:
                 try:
-                    print(f"[STREAM] Probando calidad: {quality}")
-                    self.session.audio_quality = quality
-                    stream = track.get_stream()
+                    stream = await self.run(self._fetch_stream, track_id, quality, pool="stream")
                     stream_manifest = stream.get_stream_manifest()
                     urls = stream_manifest.get_urls()
-                    print(f"[STREAM] URLs disponibles para {quality}: {len(urls)}")
+                    stream_log.debug("Manifiesto recibido", track_id=track_id, quality=quality.value, urls=len(urls))
+                    
+                    if not urls:
+                        continue
                     
-                    # Buscar la URL en formato FLAC
-                    flac_url = None
-                    for url in urls:
-                        if url.endswith('.flac'):
-                            flac_url = url
-                            print(f"[STREAM] URL FLAC encontrada con calidad {quality}: {flac_url}")
-                            return flac_url
+                    # Tidal puede entregar una calidad inferior a la pedida
+                    granted = _parse_quality(getattr(stream, 'audio_quality', None)) or quality
+                    if granted not in qualities:
+                        granted = quality
+                    manifest = ResolvedStream(
+                        track_id=track_id,
+                        quality=granted,
+                        urls=list(urls),
+                        codec=getattr(stream_manifest, 'codecs', None),
+                        mime_type=getattr(stream_manifest, 'mime_type', None),
+                        encryption_key=getattr(stream_manifest, 'encryption_key', None),
+                    )
+                    if not manifest.url.endswith('.flac'):
+                        # Si no se encuentra FLAC pero hay URLs, usar la primera
+                        stream_log.debug("Manifiesto sin FLAC, se usa la primera URL", track_id=track_id, quality=granted.value)
                     
-                    # Si no se encuentra FLAC pero hay URLs, usar la primera
-                    if urls:
-                        print(f"[STREAM] No se encontró FLAC con calidad {quality}, usando primera URL disponible")
-                        return urls[0]
+                    if max_quality is None:
+                        self.best_quality.set(track_id, granted)
+                    ttl = manifest_ttl(manifest.urls)
+                    stream_manifest_cache.set((track_id, granted), manifest, ttl=ttl)
+                    if granted != qualities[0]:
+                        # También bajo la clave consultada: con un tope de calidad la
+                        # siguiente llamada vuelve a buscar (track_id, qualities[0])
+                        stream_manifest_cache.set((track_id, qualities[0]), manifest, ttl=ttl)
+                    return manifest
                         
                 except Exception as e:
-                    print(f"[STREAM] Error al probar calidad {quality}: {str(e)}")
+                    stream_log.debug("Calidad no disponible", track_id=track_id, quality=quality.value, error=str(e))
                     continue
             
-            print("[STREAM] No se pudo obtener URL de streaming con ninguna calidad")
+            stream_log.warning("No se pudo obtener el manifiesto con ninguna calidad", track_id=track_id)
             return None
             
         except Exception as e:
-            print(f"[STREAM] Error al obtener URL de streaming: {str(e)}")
+            stream_log.error("Error al obtener el manifiesto", track_id=track_id, error=str(e))
             return None
 
-    async def download_track(self, track_id: str, output_path: str, format: OutputFormat = OutputFormat.flac) -> bool:
+    def _fetch_stream(self, track_id: str, quality: Quality) -> Stream:
+        """Pedir el stream con una calidad concreta (se ejecuta en el pool).
+
+        Equivale a Track.get_stream() pero pasa la calidad en la petición en
+        lugar de modificar session.audio_quality, que es compartido entre hilos.
+        """
+        params = {
+            "playbackmode": "STREAM",
+            "audioquality": getattr(quality, "value", quality),
+            "assetpresentation": "FULL",
+        }
+        response = self.session.request.request("GET", f"tracks/{track_id}/playbackinfopostpaywall", params)
+        return Stream().parse(response.json())
+
+    def remember_quality(self, track):
+        """Guardar la mejor calidad de una pista a partir de sus media_metadata_tags"""
+        tags = getattr(track, 'media_metadata_tags', None) or []
+        for tag, quality in QUALITY_TAGS:
+            if tag in tags:
+                if str(track.id) not in self.best_quality:
+                    self.best_quality.set(str(track.id), quality)
+                return
+
+    async def download_track(
+        self,
+        track_id: str,
+        output_path: str,
+        format: OutputFormat = OutputFormat.flac,
+        progress: Optional[Callable[[int, Optional[int]], None]] = None,
+        on_encode: Optional[Callable[[float], None]] = None
+    ) -> bool:
+        """Descargar una pista, recodificándola con ffmpeg si `format` no es FLAC.
+
+        `progress(bytes_descargados, bytes_totales)` se llama según avanza la
+        descarga y `on_encode(segundos)` al terminar la recodificación.
+        """
         try:
             # Asegurar que la extensión sea la especificada
-            output_path = str(Path(output_path).with_suffix(f'.{format}'))
+            output_path = track_output_path(output_path, format)
             
             # Crear directorio si no existe
             Path(output_path).parent.mkdir(parents=True, exist_ok=True)
             
-            # Obtener la pista y su stream
-            track = self.session.track(track_id)
-            stream = track.get_stream()
-            stream_manifest = stream.get_stream_manifest()
-            stream_url = stream_manifest.get_urls()[0]
+            # Obtener el manifiesto de la pista (reutiliza el de caché si existe)
+            manifest = await self.get_stream_manifest(track_id)
+            if not manifest:
+                download_log.warning("No se pudo obtener el stream de la pista", track_id=track_id)
+                return False
             
-            # Descargar el archivo
-            async with aiohttp.ClientSession() as session:
-                async with session.get(stream_url) as response:
-                    async with aiofiles.open(output_path, 'wb') as f:
-                        await f.write(await response.read())
+            # Descargar el archivo por bloques a un temporal y renombrarlo al terminar
+            await self._download_to_file(manifest.url, output_path, progress, format, on_encode)
             
             return True
         except Exception as e:
-            print(f"Error al descargar la pista: {str(e)}")
+            download_log.error("Error al descargar la pista", track_id=track_id, error=str(e))
             return False
 
+    async def _download_to_file(
+        self,
+        url: str,
+        output_path: str,
+        progress: Optional[Callable[[int, Optional[int]], None]] = None,
+        format: OutputFormat = OutputFormat.flac,
+        on_encode: Optional[Callable[[float], None]] = None
+    ):
+        """Descargar `url` en `output_path` con memoria acotada a DOWNLOAD_BUFFER_SIZE.
+
+        Se escribe en un archivo temporal del mismo directorio y se renombra de
+        forma atómica, así nunca queda un archivo final a medio escribir. Para
+        formatos distintos de FLAC los bytes pasan por ffmpeg según llegan.
+        """
+        target = Path(output_path)
+        temp_path = target.with_name(f".{target.name}.{uuid.uuid4().hex}.part")
+        try:
+            if format == OutputFormat.flac:
+                async with aiofiles.open(temp_path, 'wb') as f:
+                    await self._copy_url(url, f.write, progress)
+            else:
+                async with Transcoder(format.value, str(temp_path)) as transcoder:
+                    await self._copy_url(url, transcoder.write, progress)
+                if on_encode:
+                    on_encode(transcoder.encode_seconds)
+            os.replace(temp_path, target)
+        finally:
+            if temp_path.exists():
+                temp_path.unlink()
+
+    async def _copy_url(
+        self,
+        url: str,
+        write: Callable[[bytes], Awaitable[Any]],
+        progress: Optional[Callable[[int, Optional[int]], None]] = None
+    ):
+        """Copiar el cuerpo de `url` a `write` en bloques de hasta DOWNLOAD_BUFFER_SIZE"""
+        async with get_http_client().get(url) as response:
+            response.raise_for_status()
+            total = response.content_length
+            written = 0
+            buffer = bytearray()
+            async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                cdn_bytes.inc("download", amount=len(chunk))
+                buffer.extend(chunk)
+                if len(buffer) >= DOWNLOAD_BUFFER_SIZE:
+                    await write(bytes(buffer))
+                    written += len(buffer)
+                    buffer.clear()
+                    if progress:
+                        progress(written, total)
+            if buffer:
+                await write(bytes(buffer))
+                written += len(buffer)
+                if progress:
+                    progress(written, total)
+
     async def get_lyrics(self, track_id: str) -> Optional[Dict[str, Any]]:
-        """Obtener las letras de una canción"""
+        """Obtener las letras de una canción (con caché y una sola consulta por pista a la vez)"""
+        track_id = str(track_id)
+        cached = lyrics_cache.get(track_id, _LYRICS_MISSING)
+        if cached is not _LYRICS_MISSING:
+            return cached
+        return await lyrics_flights.do(track_id, lambda: self._fetch_lyrics(track_id))
+
+    def peek_lyrics(self, track_id: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """Letras ya cacheadas sin consultar a Tidal: (se conocen, letras o None si no tiene)"""
+        cached = lyrics_cache.get(str(track_id), _LYRICS_MISSING)
+        if cached is _LYRICS_MISSING:
+            return False, None
+        return True, cached
+
+    def warm_lyrics(self, track_id: str):
+        """Cargar las letras en la caché en segundo plano"""
+        task = asyncio.create_task(self.get_lyrics(track_id))
+        _revalidation_tasks.add(task)
+        task.add_done_callback(_revalidation_tasks.discard)
+
+    async def _fetch_lyrics(self, track_id: str) -> Optional[Dict[str, Any]]:
         try:
-            print(f"[LYRICS] Obteniendo letras para track ID: {track_id}")
-            track = self.session.track(track_id)
-            lyrics = track.lyrics()
+            catalog_log.debug("Obteniendo letras", track_id=track_id)
+            track = await self.run(self.session.track, track_id)
+            try:
+                lyrics = await self.run(track.lyrics)
+            except MetadataNotAvailable:
+                lyrics = None
             
             if not lyrics:
-                print("[LYRICS] No se encontraron letras")
+                catalog_log.debug("Pista sin letras", track_id=track_id)
+                lyrics_cache.set(track_id, None, ttl=LYRICS_NEGATIVE_TTL)
                 return None
                 
             # Obtener los atributos disponibles
@@ -694,13 +1195,12 @@ class TidalService:
             if hasattr(lyrics, 'rights'):
                 lyrics_data["rights"] = lyrics.rights
                 
-            print(f"[LYRICS] Letras obtenidas exitosamente para: {track.name}")
+            lyrics_cache.set(track_id, lyrics_data)
             return lyrics_data
             
         except Exception as e:
-            print(f"[LYRICS] Error al obtener letras: {str(e)}")
-            import traceback
-            print(f"[LYRICS] Traceback: {traceback.format_exc()}")
+            # Errores transitorios: no se cachean
+            catalog_log.error("Error al obtener letras", track_id=track_id, error=str(e), exc_info=True)
             return None
 
     async def get_album_cover_url(self, track, size: int = 1280) -> Optional[str]:
@@ -714,29 +1214,30 @@ class TidalService:
             URL de la portada del álbum o None si no se encuentra
         """
         try:
-            print(f"[COVER] Intentando obtener portada para track: {track.name}")
-            
             # Validar el tamaño
-            valid_sizes = [80, 160, 320, 640, 1280]
-            if size not in valid_sizes:
-                print(f"[COVER] Tamaño inválido {size}, usando 1280")
+            if size not in COVER_SIZES:
+                catalog_log.debug("Tamaño de portada inválido, se usa 1280", size=size)
                 size = 1280
             
-            # Intentar obtener la URL del álbum
-            album = self.session.album(track.album.id)
-            print(f"[COVER] Álbum encontrado: {album.name}")
+            # La pista ya trae el UUID de la portada: construir la URL sin llamar a Tidal
+            cover_uuid = getattr(track.album, 'cover', None) if track.album else None
+            if cover_uuid:
+                return build_cover_url(cover_uuid, size)
+            
+            # Sin UUID: pedir el álbum completo
+            catalog_log.debug("Pista sin UUID de portada, se consulta el álbum", track_id=track.id)
+            album = await self.run(self.session.album, track.album.id)
             
             # Intentar obtener la URL de la portada en el tamaño especificado
             try:
                 cover_url = album.image(dimensions=size)
-                print(f"[COVER] URL encontrada en album.image() con tamaño {size}: {cover_url}")
                 return cover_url
             except Exception as e:
-                print(f"[COVER] Error al obtener album.image(): {str(e)}")
+                catalog_log.debug("El álbum no tiene portada", album_id=album.id, error=str(e))
                 return None
                 
         except Exception as e:
-            print(f"[COVER] Error al obtener URL de la portada: {str(e)}")
+            catalog_log.warning("Error al obtener la portada", error=str(e))
             return None
 
     async def search_tracks(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
@@ -744,27 +1245,26 @@ class TidalService:
         try:
             
             norm_query = _normalize(query)
-            print(f"[SEARCH] Buscando tracks con query='{query}', limit={limit}")
+            search_log.debug("Buscando pistas", query=query, limit=limit)
             
             # Validar parámetros
             if not query or not isinstance(query, str):
-                print("[SEARCH] Query inválida")
+                search_log.debug("Query inválida")
                 return []
                 
             if not isinstance(limit, int) or limit < 1:
-                print("[SEARCH] Límite inválido, usando valor por defecto")
+                search_log.debug("Límite inválido, se usa el valor por defecto", limit=limit)
                 limit = 10
                 
-            if not self.session.check_login():
-                print("[SEARCH] Sesión no válida")
+            if not await self.run(self.session.check_login):
+                search_log.warning("Búsqueda sin sesión activa")
                 return []
 
             # Realizar la búsqueda
-            search_results = self.session.search(norm_query, models=[Track], limit=limit)
-            print(f"[SEARCH] Resultados recibidos: {type(search_results)}")
+            search_results = await self.run(self.session.search, norm_query, models=[Track], limit=limit)
             
             if not search_results:
-                print("[SEARCH] No se encontraron resultados")
+                search_log.debug("Búsqueda sin resultados")
                 return []
             
             # Obtener las pistas de los resultados
@@ -782,10 +1282,10 @@ class TidalService:
             elif hasattr(search_results, 'items'):
                 track_list = search_results.items
             
-            print(f"[SEARCH] Número de pistas encontradas: {len(track_list)}")
             
             for track in track_list:
                 try:
+                    self.remember_quality(track)
                     # Obtener la URL de la portada
                     cover_url = await self.get_album_cover_url(track)
                     
@@ -803,31 +1303,30 @@ class TidalService:
                         'lyrics_language': None,  # Se obtiene al solicitar
                     }
                     tracks.append(track_info)
-                    print(f"[SEARCH] Procesada pista: {track.name} - {track.artist.name}")
+                    search_log.sample("Pista procesada", track_id=track.id)
                 except Exception as e:
-                    print(f"[SEARCH] Error al procesar track: {str(e)}")
+                    search_log.warning("Error al procesar pista", track_id=getattr(track, 'id', None), error=str(e))
                     continue
 
-            print(f"[SEARCH] Encontrados {len(tracks)} tracks")
+            search_log.debug("Búsqueda de pistas completada", query=query, results=len(tracks))
             return tracks
         except Exception as e:
-            print(f"[SEARCH] Error en búsqueda: {str(e)}")
+            search_log.error("Error en búsqueda", query=query, error=str(e))
             return []
 
     async def search_tracks_by_artist(self, title: str, artist: str, limit: int = 10) -> List[Dict[str, Any]]:
         """Buscar canciones por título y artista"""
         try:
-            print(f"[SEARCH] Buscando canciones con título: {title} y artista: {artist}")
-            if not self.session.check_login():
-                print("[SEARCH] No hay sesión activa")
+            search_log.debug("Buscando pistas por artista", title=title, artist=artist, limit=limit)
+            if not await self.run(self.session.check_login):
+                search_log.warning("Búsqueda sin sesión activa")
                 return []
                 
             # Primero buscamos por título
-            search_results = self.session.search(title, models=[Track], limit=limit*2)  # Buscamos más resultados para filtrar
-            print(f"[SEARCH] Resultados recibidos: {type(search_results)}")
+            search_results = await self.run(self.session.search, title, models=[Track], limit=limit*2)  # Buscamos más resultados para filtrar
             
             if not search_results:
-                print("[SEARCH] No se encontraron resultados")
+                search_log.debug("Búsqueda sin resultados")
                 return []
             
             # Obtener las pistas de los resultados
@@ -837,7 +1336,6 @@ class TidalService:
             else:
                 track_list = search_results.get('tracks', []) if isinstance(search_results, dict) else []
             
-            print(f"[SEARCH] Número de pistas encontradas antes de filtrar: {len(track_list)}")
             
             # Normalizar los términos de búsqueda
             title = title.lower().strip()
@@ -868,33 +1366,31 @@ class TidalService:
                             "cover_url": cover_url
                         }
                         tracks.append(track_info)
-                        print(f"[SEARCH] Procesada pista: {track.name} - {track.artist.name}")
+                        search_log.sample("Pista procesada", track_id=track.id)
                         
                         if len(tracks) >= limit:
                             break
                 except Exception as e:
-                    print(f"[SEARCH] Error al procesar track {getattr(track, 'id', 'unknown')}: {str(e)}")
+                    search_log.warning("Error al procesar pista", track_id=getattr(track, 'id', None), error=str(e))
                     continue
             
-            print(f"[SEARCH] Se encontraron {len(tracks)} canciones después de filtrar por artista y título")
+            search_log.debug("Búsqueda de pistas por artista completada", title=title, artist=artist, results=len(tracks))
             return tracks
         except Exception as e:
-            print(f"[SEARCH] Error al buscar canciones: {str(e)}")
-            import traceback
-            print(f"[SEARCH] Traceback: {traceback.format_exc()}")
+            search_log.error("Error al buscar canciones", title=title, artist=artist, error=str(e), exc_info=True)
             return []
 
     async def get_mixes(self) -> List[Dict[str, Any]]:
         """Obtener los mixes disponibles para el usuario"""
         try:
-            print("[MIXES] Obteniendo mixes disponibles")
-            if not self.session.check_login():
-                print("[MIXES] No hay sesión activa")
+            catalog_log.debug("Obteniendo mixes")
+            if not await self.run(self.session.check_login):
+                catalog_log.warning("Consulta de mixes sin sesión activa")
                 return []
             
             # Obtener los mixes
-            mixes = self.session.mixes()
-            print(f"[MIXES] Número de mixes encontrados: {len(mixes)}")
+            mixes = await self.run(self.session.mixes)
+            catalog_log.debug("Mixes recibidos", mixes=len(mixes))
             
             # Procesar cada mix
             mixes_info = []
@@ -912,7 +1408,7 @@ class TidalService:
                                 cover_url = mix.image(dimensions=320)  # Usar resolución mínima
                     
                     # Obtener el número de pistas usando items()
-                    number_of_tracks = len(mix.items()) if hasattr(mix, 'items') else 0
+                    number_of_tracks = len(await self.run(mix.items)) if hasattr(mix, 'items') else 0
                     
                     mix_info = {
                         "id": mix.id,
@@ -922,72 +1418,79 @@ class TidalService:
                         "number_of_tracks": number_of_tracks
                     }
                     mixes_info.append(mix_info)
-                    print(f"[MIXES] Procesado mix: {mix.title}")
+                    catalog_log.sample("Mix procesado", mix_id=mix.id)
                 except Exception as e:
-                    print(f"[MIXES] Error al procesar mix {getattr(mix, 'id', 'unknown')}: {str(e)}")
+                    catalog_log.warning("Error al procesar mix", mix_id=getattr(mix, 'id', None), error=str(e))
                     continue
             
             return mixes_info
         except Exception as e:
-            print(f"[MIXES] Error al obtener mixes: {str(e)}")
+            catalog_log.error("Error al obtener mixes", error=str(e))
             return []
 
     async def get_mix_tracks(self, mix_id: str) -> List[Dict[str, Any]]:
         """Obtener las pistas de un mix específico"""
         try:
-            print(f"[MIXES] Obteniendo pistas para mix ID: {mix_id}")
-            if not self.session.check_login():
-                print("[MIXES] No hay sesión activa")
+            catalog_log.debug("Obteniendo pistas del mix", mix_id=mix_id)
+            if not await self.run(self.session.check_login):
+                catalog_log.warning("Consulta de mixes sin sesión activa")
                 return []
             
             # Obtener el mix
-            mix = self.session.mix(mix_id)
+            mix = await self.run(self.session.mix, mix_id)
             if not mix:
-                print(f"[MIXES] Mix no encontrado: {mix_id}")
+                catalog_log.info("Mix no encontrado", mix_id=mix_id)
                 return []
             
             # Obtener las pistas usando items()
             tracks = []
-            for item in mix.items():
+            for item in await self.run(mix.items):
                 try:
                     # Verificar si el item es una pista
                     if not isinstance(item, Track):
                         continue
-                        
-                    # Obtener la portada del álbum
-                    cover_url = await self.get_album_cover_url(item, size=1280)
-                    
-                    track_info = {
-                        "id": item.id,
-                        "name": item.name,
-                        "artist": item.artist.name,
-                        "album": item.album.name,
-                        "duration": item.duration,
-                        "cover_url": cover_url
-                    }
-                    tracks.append(track_info)
-                    print(f"[MIXES] Procesada pista: {item.name} - {item.artist.name}")
+                    self.remember_quality(item)
+                    tracks.append(await self._listing_track_info(item))
+                    catalog_log.sample("Pista del mix procesada", mix_id=mix_id, track_id=item.id)
                 except Exception as e:
-                    print(f"[MIXES] Error al procesar track {getattr(item, 'id', 'unknown')}: {str(e)}")
+                    catalog_log.warning("Error al procesar pista del mix", mix_id=mix_id, track_id=getattr(item, 'id', None), error=str(e))
                     continue
             
             return tracks
         except Exception as e:
-            print(f"[MIXES] Error al obtener pistas del mix: {str(e)}")
+            catalog_log.error("Error al obtener pistas del mix", mix_id=mix_id, error=str(e))
             return []
 
+    async def get_mix_track_pages(self, mix_id: str, offset: int = 0, limit: Optional[int] = None) -> Optional[Tuple[int, AsyncIterator[List[Dict[str, Any]]]]]:
+        """Total de pistas del mix y un iterador que las entrega página a página"""
+        try:
+            mix = await self.run(self.session.mix, mix_id)
+            if not mix:
+                catalog_log.info("Mix no encontrado", mix_id=mix_id)
+                return None
+            # tidalapi no pagina los mixes: se trae la lista una vez y se trocea
+            items = [item for item in await self.run(mix.items) if isinstance(item, Track)]
+        except Exception as e:
+            catalog_log.error("Error al obtener el mix", mix_id=mix_id, error=str(e))
+            return None
+
+        def fetch_page(size: int, start: int):
+            return items[start:start + size]
+
+        return len(items), self._listing_pages(fetch_page, self._listing_track_info, offset, limit, len(items))
+
     async def get_mix_info(self, mix_id: str) -> Optional[Dict[str, Any]]:
         """Obtener información detallada de un mix"""
         try:
-            print(f"[MIXES] Obteniendo información para mix ID: {mix_id}")
-            if not self.session.check_login():
-                print("[MIXES] No hay sesión activa")
+            catalog_log.debug("Obteniendo información del mix", mix_id=mix_id)
+            if not await self.run(self.session.check_login):
+                catalog_log.warning("Consulta de mixes sin sesión activa")
                 return None
             
             # Obtener el mix
-            mix = self.session.mix(mix_id)
+            mix = await self.run(self.session.mix, mix_id)
             if not mix:
-                print(f"[MIXES] Mix no encontrado: {mix_id}")
+                catalog_log.info("Mix no encontrado", mix_id=mix_id)
                 return None
             
             # Obtener la portada del mix
@@ -1015,89 +1518,122 @@ class TidalService:
             
             return mix_info
         except Exception as e:
-            print(f"[MIXES] Error al obtener información del mix: {str(e)}")
+            catalog_log.error("Error al obtener información del mix", mix_id=mix_id, error=str(e))
             return None
 
     async def get_album_info(self, album_id: str) -> Optional[Dict[str, Any]]:
         """Obtener información detallada de un álbum"""
         try:
-            print(f"[ALBUM] Obteniendo información para álbum ID: {album_id}")
-            if not self.session.check_login():
-                print("[ALBUM] No hay sesión activa")
+            catalog_log.debug("Obteniendo información del álbum", album_id=album_id)
+            if not await self.run(self.session.check_login):
+                catalog_log.warning("Consulta de álbum sin sesión activa")
                 return None
             
             # Obtener el álbum
-            album = self.session.album(album_id)
+            album = await self.run(self.session.album, album_id)
             if not album:
-                print(f"[ALBUM] Álbum no encontrado: {album_id}")
+                catalog_log.info("Álbum no encontrado", album_id=album_id)
                 return None
             
             # Obtener la portada del álbum
-            cover_url = None
-            try:
-                cover_url = album.image(dimensions=1280)
-            except Exception as e:
-                print(f"[ALBUM] Error al obtener portada: {str(e)}")
+            cover_url = self._album_cover(album)
             
             # Obtener las pistas del álbum
             tracks = []
-            for track in album.tracks():
+            for track in await self.run(album.tracks):
                 try:
-                    # Obtener la portada para cada pista
-                    track_cover_url = cover_url  # Usar la portada del álbum por defecto
-                    try:
-                        track_cover_url = await self.get_album_cover_url(track)
-                    except Exception as e:
-                        print(f"[ALBUM] Error al obtener portada de pista: {str(e)}")
-                    
-                    track_info = {
-                        "id": track.id,
-                        "name": track.name,
-                        "artist": track.artist.name,
-                        "duration": track.duration,
-                        "track_number": track.track_num,
-                        "volume_number": track.volume_num,
-                        "explicit": track.explicit,
-                        "cover_url": track_cover_url
-                    }
-                    tracks.append(track_info)
-                    print(f"[ALBUM] Procesada pista: {track.name}")
+                    self.remember_quality(track)
+                    tracks.append(await self._album_track_info(track, cover_url))
+                    catalog_log.sample("Pista del álbum procesada", album_id=album_id, track_id=track.id)
                 except Exception as e:
-                    print(f"[ALBUM] Error al procesar track {getattr(track, 'id', 'unknown')}: {str(e)}")
+                    catalog_log.warning("Error al procesar pista del álbum", album_id=album_id, track_id=getattr(track, 'id', None), error=str(e))
                     continue
             
-            album_info = {
-                "id": album.id,
-                "name": album.name,
-                "artist": album.artist.name,
-                "cover_url": cover_url,
-                "release_date": album.release_date.isoformat() if album.release_date else None,
-                "number_of_tracks": len(tracks),
-                "duration": album.duration,
-                "tracks": tracks
-            }
+            album_info = self._album_summary(album, cover_url)
+            album_info["number_of_tracks"] = len(tracks)
+            album_info["tracks"] = tracks
             
             return album_info
         except Exception as e:
-            print(f"[ALBUM] Error al obtener información del álbum: {str(e)}")
+            catalog_log.error("Error al obtener información del álbum", album_id=album_id, error=str(e))
+            return None
+
+    async def get_album_track_pages(self, album_id: str, offset: int = 0, limit: Optional[int] = None) -> Optional[Tuple[Dict[str, Any], AsyncIterator[List[Dict[str, Any]]]]]:
+        """Datos del álbum (sin pistas) y un iterador que entrega sus pistas página a página"""
+        try:
+            album = await self.run(self.session.album, album_id)
+            if not album:
+                catalog_log.info("Álbum no encontrado", album_id=album_id)
+                return None
+        except Exception as e:
+            catalog_log.error("Error al obtener el álbum", album_id=album_id, error=str(e))
+            return None
+
+        cover_url = self._album_cover(album)
+        album_info = self._album_summary(album, cover_url)
+
+        def fetch_page(size: int, start: int):
+            return album.tracks(limit=size, offset=start)
+
+        async def format_track(track) -> Dict[str, Any]:
+            return await self._album_track_info(track, cover_url)
+
+        pages = self._listing_pages(fetch_page, format_track, offset, limit, album_info["number_of_tracks"])
+        return album_info, pages
+
+    def _album_cover(self, album) -> Optional[str]:
+        try:
+            return album.image(dimensions=1280)
+        except Exception as e:
+            catalog_log.debug("El álbum no tiene portada", album_id=album.id, error=str(e))
             return None
 
+    def _album_summary(self, album, cover_url: Optional[str]) -> Dict[str, Any]:
+        """Datos generales del álbum, sin la lista de pistas"""
+        return {
+            "id": album.id,
+            "name": album.name,
+            "artist": album.artist.name,
+            "cover_url": cover_url,
+            "release_date": album.release_date.isoformat() if album.release_date else None,
+            "number_of_tracks": album.num_tracks or 0,
+            "duration": album.duration
+        }
+
+    async def _album_track_info(self, track, album_cover_url: Optional[str]) -> Dict[str, Any]:
+        """Datos de una pista dentro del listado de un álbum"""
+        # Obtener la portada para cada pista
+        track_cover_url = album_cover_url  # Usar la portada del álbum por defecto
+        try:
+            track_cover_url = await self.get_album_cover_url(track)
+        except Exception as e:
+            catalog_log.debug("Error al obtener portada de pista", track_id=track.id, error=str(e))
+        return {
+            "id": track.id,
+            "name": track.name,
+            "artist": track.artist.name,
+            "duration": track.duration,
+            "track_number": track.track_num,
+            "volume_number": track.volume_num,
+            "explicit": track.explicit,
+            "cover_url": track_cover_url
+        }
+
     async def search_albums(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
         """Buscar álbumes por nombre"""
         try:
-            print(f"[SEARCH] Buscando álbumes con query: {query}")
-            if not self.session.check_login():
-                print("[SEARCH] No hay sesión activa")
+            search_log.debug("Buscando álbumes", query=query, limit=limit)
+            if not await self.run(self.session.check_login):
+                search_log.warning("Búsqueda sin sesión activa")
                 return []
                 
             # Normalizar la query
             norm_query = _normalize(query)
-            search_results = self.session.search(norm_query, models=[Album], limit=limit)
-            print(f"[SEARCH] Resultados recibidos: {type(search_results)}")
+            search_results = await self.run(self.session.search, norm_query, models=[Album], limit=limit)
             
             # Verificar si hay resultados
             if not search_results:
-                print("[SEARCH] No se encontraron resultados")
+                search_log.debug("Búsqueda sin resultados")
                 return []
             
             # Obtener los álbumes de los resultados
@@ -1107,7 +1643,6 @@ class TidalService:
             else:
                 album_list = search_results.get('albums', []) if isinstance(search_results, dict) else []
             
-            print(f"[SEARCH] Número de álbumes encontrados: {len(album_list)}")
             
             for album in album_list:
                 try:
@@ -1116,7 +1651,7 @@ class TidalService:
                     try:
                         cover_url = album.image(dimensions=1280)
                     except Exception as e:
-                        print(f"[SEARCH] Error al obtener portada: {str(e)}")
+                        search_log.debug("El álbum no tiene portada", album_id=album.id, error=str(e))
                     
                     album_info = {
                         "id": album.id,
@@ -1128,33 +1663,30 @@ class TidalService:
                         "duration": album.duration
                     }
                     albums.append(album_info)
-                    print(f"[SEARCH] Procesado álbum: {album.name} - {album.artist.name}")
+                    search_log.sample("Álbum procesado", album_id=album.id)
                 except Exception as e:
-                    print(f"[SEARCH] Error al procesar álbum {getattr(album, 'id', 'unknown')}: {str(e)}")
+                    search_log.warning("Error al procesar álbum", album_id=getattr(album, 'id', None), error=str(e))
                     continue
             
-            print(f"[SEARCH] Se encontraron {len(albums)} álbumes")
+            search_log.debug("Búsqueda de álbumes completada", query=query, results=len(albums))
             return albums
         except Exception as e:
-            print(f"[SEARCH] Error al buscar álbumes: {str(e)}")
-            import traceback
-            print(f"[SEARCH] Traceback: {traceback.format_exc()}")
+            search_log.error("Error al buscar álbumes", query=query, error=str(e), exc_info=True)
             return []
 
     async def search_albums_by_artist(self, title: str, artist: str, limit: int = 10) -> List[Dict[str, Any]]:
         """Buscar álbumes por título y artista"""
         try:
-            print(f"[SEARCH] Buscando álbumes con título: {title} y artista: {artist}")
-            if not self.session.check_login():
-                print("[SEARCH] No hay sesión activa")
+            search_log.debug("Buscando álbumes por artista", title=title, artist=artist, limit=limit)
+            if not await self.run(self.session.check_login):
+                search_log.warning("Búsqueda sin sesión activa")
                 return []
                 
             # Primero buscamos por título
-            search_results = self.session.search(title, models=[Album], limit=limit*2)
-            print(f"[SEARCH] Resultados recibidos: {type(search_results)}")
+            search_results = await self.run(self.session.search, title, models=[Album], limit=limit*2)
             
             if not search_results:
-                print("[SEARCH] No se encontraron resultados")
+                search_log.debug("Búsqueda sin resultados")
                 return []
             
             # Obtener los álbumes de los resultados
@@ -1164,7 +1696,6 @@ class TidalService:
             else:
                 album_list = search_results.get('albums', []) if isinstance(search_results, dict) else []
             
-            print(f"[SEARCH] Número de álbumes encontrados antes de filtrar: {len(album_list)}")
             
             # Normalizar los términos de búsqueda
             title = title.lower().strip()
@@ -1186,7 +1717,7 @@ class TidalService:
                         try:
                             cover_url = album.image(dimensions=1280)
                         except Exception as e:
-                            print(f"[SEARCH] Error al obtener portada: {str(e)}")
+                            search_log.debug("El álbum no tiene portada", album_id=album.id, error=str(e))
                         
                         album_info = {
                             "id": album.id,
@@ -1198,20 +1729,18 @@ class TidalService:
                             "duration": album.duration
                         }
                         albums.append(album_info)
-                        print(f"[SEARCH] Procesado álbum: {album.name} - {album.artist.name}")
+                        search_log.sample("Álbum procesado", album_id=album.id)
                         
                         if len(albums) >= limit:
                             break
                 except Exception as e:
-                    print(f"[SEARCH] Error al procesar álbum {getattr(album, 'id', 'unknown')}: {str(e)}")
+                    search_log.warning("Error al procesar álbum", album_id=getattr(album, 'id', None), error=str(e))
                     continue
             
-            print(f"[SEARCH] Se encontraron {len(albums)} álbumes después de filtrar por artista y título")
+            search_log.debug("Búsqueda de álbumes por artista completada", title=title, artist=artist, results=len(albums))
             return albums
         except Exception as e:
-            print(f"[SEARCH] Error al buscar álbumes: {str(e)}")
-            import traceback
-            print(f"[SEARCH] Traceback: {traceback.format_exc()}")
+            search_log.error("Error al buscar álbumes", title=title, artist=artist, error=str(e), exc_info=True)
             return []
 
     async def get_user_playlists(self) -> List[Dict[str, Any]]:
@@ -1220,9 +1749,9 @@ class TidalService:
         sin duplicados y con el flag `is_own` correctamente asignado.
         """
         try:
-            print("[PLAYLISTS] Obteniendo playlists del usuario")
-            if not self.session.check_login():
-                print("[PLAYLISTS] No hay sesión activa")
+            catalog_log.debug("Obteniendo playlists del usuario")
+            if not await self.run(self.session.check_login):
+                catalog_log.warning("Consulta de playlists sin sesión activa")
                 return []
 
             playlists_info: List[Dict[str, Any]] = []
@@ -1252,7 +1781,7 @@ class TidalService:
                             continue
 
                 except Exception as e:
-                    print(f"[PLAYLISTS] Error al obtener imágenes: {e}")
+                    catalog_log.debug("Error al obtener imágenes de la playlist", playlist_id=pl.id, error=str(e))
 
                 return {
                     "id": pl.id,
@@ -1269,17 +1798,15 @@ class TidalService:
                 }
 
             # Playlists creadas por el usuario
-            print("[PLAYLISTS] Obteniendo playlists propias")
-            for pl in self.session.user.playlists():
+            for pl in await self.run(self.session.user.playlists):
                 if pl.id in seen_ids:
                     continue
                 seen_ids.add(pl.id)
                 playlists_info.append(build_info(pl, True))
-                print(f"[PLAYLISTS] Procesada playlist propia: {pl.name}")
+                catalog_log.sample("Playlist propia procesada", playlist_id=pl.id)
 
             # Playlists seguidas/favoritas
-            print("[PLAYLISTS] Obteniendo playlists seguidas")
-            for pl in self.session.user.favorites.playlists():
+            for pl in await self.run(self.session.user.favorites.playlists):
                 if pl.id in seen_ids:
                     continue
 
@@ -1292,12 +1819,12 @@ class TidalService:
 
                 seen_ids.add(pl.id)
                 playlists_info.append(build_info(pl, False))
-                print(f"[PLAYLISTS] Procesada playlist seguida: {pl.name}")
+                catalog_log.sample("Playlist seguida procesada", playlist_id=pl.id)
 
             return playlists_info
 
         except Exception as e:
-            print(f"[PLAYLISTS] Error al obtener playlists del usuario: {e}")
+            catalog_log.error("Error al obtener playlists del usuario", error=str(e))
             return []
 
     def check_session(self) -> bool:
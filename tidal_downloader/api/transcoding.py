@@ -0,0 +1,246 @@
+import asyncio
+import os
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+# Configuración de la recodificación con ffmpeg
+FFMPEG_PATH = os.getenv("FFMPEG_PATH", "ffmpeg")
+# Un codificador por núcleo: ffmpeg usa un hilo por pista de audio
+TRANSCODE_MAX_ENCODERS = int(os.getenv("TRANSCODE_MAX_ENCODERS", os.cpu_count() or 1))
+
+# Espera máxima por un codificador libre en el streaming en vivo
+TRANSCODE_QUEUE_TIMEOUT = float(os.getenv("TRANSCODE_QUEUE_TIMEOUT", 5))
+
+# Argumentos de salida de ffmpeg por formato de archivo
+OUTPUT_ARGS: Dict[str, List[str]] = {
+    "mp3": ["-codec:a", "libmp3lame", "-q:a", "0", "-f", "mp3"],
+    "m4a": ["-codec:a", "aac", "-b:a", "256k", "-movflags", "+faststart", "-f", "ipod"],
+    "wav": ["-codec:a", "pcm_s16le", "-f", "wav"],
+}
+
+# Códecs del streaming en vivo: argumentos de salida, tipo MIME, extensión y bitrate por defecto (kbps)
+STREAM_CODECS: Dict[str, Tuple[List[str], str, str, int]] = {
+    "aac": (["-codec:a", "aac", "-f", "adts"], "audio/aac", "aac", 128),
+    "opus": (["-codec:a", "libopus", "-f", "ogg"], "audio/ogg", "ogg", 96),
+}
+
+
+class TranscodeError(RuntimeError):
+    """ffmpeg no está disponible o terminó con error."""
+
+
+class TranscodeBusyError(TranscodeError):
+    """Todos los codificadores están ocupados y no se liberó ninguno a tiempo."""
+
+
+class EncoderLimiter:
+    """Límite de procesos ffmpeg simultáneos, compartido por toda la aplicación"""
+
+    def __init__(self, max_encoders: int):
+        self.max_encoders = max_encoders
+        self._slots: Optional[asyncio.Semaphore] = None
+
+        # Métricas
+        self.waiting = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.total_encode_time = 0.0
+
+    @property
+    def slots(self) -> asyncio.Semaphore:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_encoders)
+        return self._slots
+
+    async def spawn(self, args: List[str], stdout: int, stderr: int, timeout: Optional[float] = None) -> asyncio.subprocess.Process:
+        """Esperar un codificador libre y arrancar ffmpeg con `args`"""
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self.slots.acquire(), timeout=timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise TranscodeBusyError(f"Los {self.max_encoders} codificadores están ocupados")
+        finally:
+            self.waiting -= 1
+        try:
+            process = await asyncio.create_subprocess_exec(
+                FFMPEG_PATH, "-hide_banner", "-loglevel", "error", *args,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=stdout,
+                stderr=stderr,
+            )
+        except OSError as e:
+            self.slots.release()
+            raise TranscodeError(f"No se pudo ejecutar ffmpeg ('{FFMPEG_PATH}'): {str(e)}")
+        self.running += 1
+        return process
+
+    def release(self, encode_seconds: float, failed: bool):
+        """Liberar el codificador de un proceso ffmpeg ya terminado"""
+        self.total_encode_time += encode_seconds
+        self.running -= 1
+        if failed:
+            self.failed += 1
+        else:
+            self.completed += 1
+        self.slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_encoders": self.max_encoders,
+            "running": self.running,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "encode_seconds": round(self.total_encode_time, 3),
+        }
+
+
+encoder_limiter = EncoderLimiter(TRANSCODE_MAX_ENCODERS)
+
+
+class Transcoder:
+    """Proceso ffmpeg que recibe el audio original por stdin y escribe `output_path`.
+
+    Uso:
+        async with Transcoder("mp3", path) as transcoder:
+            await transcoder.write(chunk)
+
+    Al salir sin error se cierra stdin y se espera a ffmpeg; si hubo una
+    excepción el proceso se mata. `encode_seconds` es el tiempo total que
+    el proceso estuvo vivo.
+    """
+
+    def __init__(self, format: str, output_path: str):
+        if format not in OUTPUT_ARGS:
+            raise ValueError(f"Formato de salida no soportado: {format}")
+        self.format = format
+        self.output_path = output_path
+        self.encode_seconds = 0.0
+        self._process: Optional[asyncio.subprocess.Process] = None
+        self._stderr: Optional[asyncio.Task] = None
+        self._started_at = 0.0
+
+    async def __aenter__(self) -> "Transcoder":
+        self._process = await encoder_limiter.spawn(
+            ["-i", "pipe:0", "-vn", "-map_metadata", "0", *OUTPUT_ARGS[self.format], "-y", self.output_path],
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        self._started_at = time.perf_counter()
+        # Leer stderr en paralelo para que ffmpeg nunca se bloquee escribiendo en él
+        self._stderr = asyncio.create_task(self._process.stderr.read())
+        return self
+
+    async def write(self, data: bytes):
+        """Enviar bytes a ffmpeg; espera si ffmpeg va más lento que la descarga"""
+        try:
+            self._process.stdin.write(data)
+            await self._process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            # ffmpeg terminó antes de tiempo: el error real está en stderr
+            raise TranscodeError(await self._error_output())
+
+    async def __aexit__(self, exc_type, exc, tb):
+        failed = exc_type is not None
+        try:
+            if failed:
+                if self._process.returncode is None:
+                    self._process.kill()
+                await self._process.wait()
+            else:
+                self._process.stdin.close()
+                if await self._process.wait() != 0:
+                    raise TranscodeError(await self._error_output())
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            self.encode_seconds = time.perf_counter() - self._started_at
+            encoder_limiter.release(self.encode_seconds, failed)
+            if self._stderr is not None and not self._stderr.done():
+                self._stderr.cancel()
+        return False
+
+    async def _error_output(self) -> str:
+        await self._process.wait()
+        stderr = (await self._stderr).decode(errors="replace").strip()
+        return f"ffmpeg terminó con código {self._process.returncode}: {stderr[-500:]}"
+
+
+class LiveTranscode:
+    """ffmpeg en tiempo real para el streaming: audio original por stdin, AAC u Opus por stdout.
+
+    `start()` reserva un codificador (falla con TranscodeBusyError si no hay
+    ninguno libre a tiempo) y `stream()` devuelve la salida por bloques según
+    ffmpeg la produce. Al cerrar el generador (p. ej. el cliente se
+    desconecta) se mata el proceso y se libera el codificador.
+    """
+
+    def __init__(self, codec: str, bitrate: Optional[int] = None):
+        if codec not in STREAM_CODECS:
+            raise ValueError(f"Códec no soportado: {codec}")
+        self.output_args, self.media_type, self.extension, default_bitrate = STREAM_CODECS[codec]
+        self.codec = codec
+        self.bitrate = bitrate or default_bitrate
+        self._process: Optional[asyncio.subprocess.Process] = None
+        self._feeder: Optional[asyncio.Task] = None
+        self._started_at = 0.0
+        self._closed = False
+
+    async def start(self, timeout: float = TRANSCODE_QUEUE_TIMEOUT):
+        self._process = await encoder_limiter.spawn(
+            [
+                # Sondeo mínimo de la entrada para que el primer bloque salga cuanto antes
+                "-probesize", "32768", "-analyzeduration", "0",
+                "-i", "pipe:0", "-vn", "-b:a", f"{self.bitrate}k",
+                *self.output_args, "-flush_packets", "1", "pipe:1",
+            ],
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+            timeout=timeout,
+        )
+        self._started_at = time.perf_counter()
+
+    async def stream(self, source: AsyncIterator[bytes], chunk_size: int) -> AsyncIterator[bytes]:
+        """Enviar `source` a ffmpeg y devolver su salida en bloques de hasta `chunk_size`"""
+        self._feeder = asyncio.create_task(self._feed(source))
+        try:
+            while True:
+                chunk = await self._process.stdout.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+            await self._feeder
+            await self._process.wait()
+        finally:
+            await self.close()
+
+    async def _feed(self, source: AsyncIterator[bytes]):
+        stdin = self._process.stdin
+        try:
+            async for chunk in source:
+                stdin.write(chunk)
+                await stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            # ffmpeg ya terminó; el lector de stdout verá el final
+            pass
+        finally:
+            stdin.close()
+
+    async def close(self):
+        """Terminar ffmpeg (si sigue vivo) y liberar el codificador; se puede llamar varias veces"""
+        if self._closed or self._process is None:
+            return
+        self._closed = True
+        if self._feeder is not None:
+            self._feeder.cancel()
+        interrupted = self._process.returncode is None
+        if interrupted:
+            self._process.kill()
+        returncode = await self._process.wait()
+        # Cortar un stream porque el cliente se fue no es un fallo del codificador
+        encoder_limiter.release(time.perf_counter() - self._started_at, failed=not interrupted and returncode != 0)